@@ -0,0 +1,265 @@
+"""Content-addressed, compressed roster backups with point-in-time restore.
+
+A backup directory (default ``<data_file>.backups``) holds:
+
+    objects/ab/abcd...     gzip-compressed packs of JSON Lines records (or
+                           enrollment log segments), named by the SHA-256 of
+                           their uncompressed content, so identical packs are
+                           stored once
+    manifests/<id>.json    one per backup: when it was taken, its parent, its
+                           packs and the student IDs deleted since the parent
+
+A full backup stores every record. An incremental one stores only the
+records changed or deleted since its parent, found through the change log
+(see ChangeLog), plus the bytes appended to the enrollment log, so restoring means replaying the chain from the last full
+backup. A manifest is written last, so an interrupted backup leaves only
+unreferenced objects behind.
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from storage import append_locked
+
+PACK_RECORDS = 50000  # Records per pack
+MAX_CHAIN = 30        # Incrementals before the next backup is a full one again
+
+
+class ChangeLog:
+    """Append-only list of student IDs written, one per line, in ``<data_file>.changes``.
+
+    Every process that writes the roster appends the IDs of a batch just
+    before committing it, once the first backup has created the file. A
+    manifest records how far into the log it reached, so the next
+    incremental backup reads only the IDs logged since then, however
+    large the roster is. Logging ahead of the commit means an ID may be
+    listed for a change that never landed, which only costs an unchanged
+    record in the next backup, but never the other way round.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def create(self):
+        open(self.path, 'ab').close()
+
+    def size(self):
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    def append(self, student_ids):
+        if not student_ids:
+            return
+        append_locked(self.path, ''.join(student_id + '\n' for student_id in student_ids).encode('utf-8'))
+
+    def read(self, start, end):
+        """The distinct IDs logged between two byte offsets (whole lines only)"""
+        with open(self.path, 'rb') as file:
+            file.seek(start)
+            data = file.read(end - start)
+        return set(data[:data.rfind(b'\n') + 1].decode('utf-8').split())
+
+
+def _fsync_write(path, data):
+    tmp_file = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_file, 'wb') as file:
+        file.write(data)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp_file, path)
+
+
+class BackupStore:
+    def __init__(self, directory):
+        self.directory = directory
+        self.objects = os.path.join(directory, 'objects')
+        self.manifest_dir = os.path.join(directory, 'manifests')
+
+    def _object_path(self, digest):
+        return os.path.join(self.objects, digest[:2], digest)
+
+    def put_object(self, data):
+        """Store bytes once under their hash; returns (hash, compressed size written)"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if os.path.exists(path):
+            return digest, 0
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        compressed = gzip.compress(data, compresslevel=6, mtime=0)
+        _fsync_write(path, compressed)
+        return digest, len(compressed)
+
+    def get_object(self, digest):
+        with open(self._object_path(digest), 'rb') as file:
+            data = gzip.decompress(file.read())
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Backup object {digest} is corrupt")
+        return data
+
+    def manifests(self):
+        """Every backup's manifest, oldest first"""
+        try:
+            names = sorted(os.listdir(self.manifest_dir))
+        except FileNotFoundError:
+            return []
+        manifests = []
+        for name in names:
+            if name.endswith('.json'):
+                with open(os.path.join(self.manifest_dir, name)) as file:
+                    manifests.append(json.load(file))
+        return manifests
+
+    def latest(self, at=None):
+        """Newest manifest (taken at or before epoch time ``at``), or None"""
+        candidates = [m for m in self.manifests() if at is None or m['time'] <= at]
+        return candidates[-1] if candidates else None
+
+    def chain(self, manifest):
+        """Manifests from the last full backup up to manifest, oldest first"""
+        by_id = {m['id']: m for m in self.manifests()}
+        chain = [manifest]
+        while chain[-1]['kind'] != 'full':
+            parent = by_id.get(chain[-1]['parent'])
+            if parent is None:
+                raise ValueError(f"Backup {chain[-1]['id']} is missing its parent {chain[-1]['parent']}")
+            chain.append(parent)
+        return chain[::-1]
+
+    def _records(self, manifest):
+        for digest in manifest['packs']:
+            for line in self.get_object(digest).splitlines():
+                yield json.loads(line)
+
+    def records_at(self, manifest):
+        """student_id -> stored record as of manifest, replaying its chain"""
+        records = {}
+        for step in self.chain(manifest):
+            for student_id in step['deleted']:
+                records.pop(student_id, None)
+            for record in self._records(step):
+                records[record['student_id']] = record
+        return records
+
+    def enrollment_log_at(self, manifest):
+        """The enrollment log's contents as of manifest"""
+        return b''.join(self.get_object(digest) for step in self.chain(manifest)
+                        for digest in step['enrollment_log']['segments'])
+
+    def write(self, parent, records, deleted, students, id_high_water=None,
+              enrollment_log=None, changes=None, started=None):
+        """Store a backup and return its manifest.
+
+        ``records`` are the record dicts to store (all of them for a full
+        backup, i.e. when ``parent`` is None); ``deleted`` the IDs removed
+        since ``parent``; ``students`` the roster size; ``changes`` the
+        (start, end) offsets of the change log this backup covers.
+        ``started`` is when the caller began, so 'seconds' is the whole cost.
+        """
+        started = time.perf_counter() if started is None else started
+        created = datetime.now()
+        manifest_id = created.strftime('%Y%m%dT%H%M%S-%f')
+        packs = []
+        versions = {} if parent is not None else None  # What an incremental stored, for the next one
+        written = 0
+        count = 0
+        chunk = []
+        records = iter(records)
+        while True:
+            record = next(records, None)
+            if record is not None:
+                if versions is not None:
+                    versions[record['student_id']] = record['version']
+                chunk.append(json.dumps(record, sort_keys=True, separators=(',', ':')))
+                count += 1
+            if chunk and (record is None or len(chunk) >= PACK_RECORDS):
+                digest, size = self.put_object(('\n'.join(chunk) + '\n').encode('utf-8'))
+                packs.append(digest)
+                written += size
+                chunk = []
+            if record is None:
+                break
+
+        # The enrollment log only grows, so only the new bytes need storing
+        start = parent['enrollment_log']['size'] if parent is not None else 0
+        log = {'size': start, 'segments': []}
+        if enrollment_log is not None and os.path.exists(enrollment_log):
+            with open(enrollment_log, 'rb') as file:
+                file.seek(0, os.SEEK_END)
+                size = file.tell()
+                if size < start:
+                    raise ValueError("The enrollment log shrank; take a full backup")
+                file.seek(start)
+                data = file.read(size - start)
+            end = data.rfind(b'\n') + 1  # Whole events only
+            if end:
+                digest, written_size = self.put_object(data[:end])
+                log['segments'].append(digest)
+                written += written_size
+            log['size'] = start + end
+
+        manifest = {
+            'id': manifest_id,
+            'created': created.isoformat(timespec='seconds'),
+            'time': int(created.timestamp()),  # Whole seconds, matching 'created'
+            'kind': 'full' if parent is None else 'incremental',
+            'parent': parent['id'] if parent is not None else None,
+            'packs': packs,
+            'records': count,
+            'deleted': sorted(deleted),
+            'students': students,
+            'id_high_water': id_high_water,
+            'enrollment_log': log,
+            'changes': list(changes) if changes is not None else None,
+            'versions': versions,
+            'bytes_written': written,
+            'seconds': round(time.perf_counter() - started, 3),
+        }
+        os.makedirs(self.manifest_dir, exist_ok=True)
+        _fsync_write(os.path.join(self.manifest_dir, manifest_id + '.json'),
+                     json.dumps(manifest, indent=1).encode('utf-8'))
+        return manifest
+
+
+class BackupThread(threading.Thread):
+    """Calls ``backup()`` every ``interval`` seconds, or at once on request"""
+
+    def __init__(self, backup, interval=None):
+        super().__init__(daemon=True)
+        self.backup = backup
+        self.interval = interval
+        self.last_result = None  # Manifest or exception of the latest run
+        self._wake = threading.Event()
+        self._requested = False
+        self._stopping = False
+
+    def request(self):
+        """Take a backup as soon as possible, without waiting for it"""
+        self._requested = True
+        self._wake.set()
+
+    def stop(self):
+        """Finish a backup in progress or requested and end the thread"""
+        self._stopping = True
+        self._wake.set()
+        self.join()
+
+    def run(self):
+        while not self._stopping:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopping and not self._requested:
+                return
+            self._requested = False
+            try:
+                self.last_result = self.backup()
+            except Exception as e:
+                self.last_result = e
@@ -0,0 +1,743 @@
+"""Performance benchmarks for the Student Management System.
+
+Run ``python benchmark.py <name>``; see ``python benchmark.py --help``.
+"""
+import argparse
+import collections
+import contextlib
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import reports
+import validation
+from indexes import ContactIndex, SearchIndex
+from main import Student, StudentManagementSystem
+from storage import ConflictError, IdAllocator, open_backend
+
+COURSES = ['Computer Science', 'Mathematics', 'Physics', 'Chemistry', 'Biology',
+           'Economics', 'History', 'Literature', 'Philosophy', 'Engineering']
+GRADES = ['A', 'B', 'C', 'D', 'F', None]
+FIRST_NAMES = ['Ali', 'Sara', 'John', 'Maria', 'Wei', 'Fatima', 'Carlos', 'Aisha', 'Ivan', 'Priya',
+               'Omar', 'Emma', 'Kenji', 'Zara', 'Lucas', 'Noor', 'David', 'Hana', 'Mateo', 'Leila']
+LAST_NAMES = ['Khan', 'Smith', 'Garcia', 'Chen', 'Ahmed', 'Muller', 'Rossi', 'Kim', 'Novak', 'Silva',
+              'Hamza', 'Brown', 'Tanaka', 'Lopez', 'Ivanova', 'Haddad', 'Nguyen', 'Patel', 'Cohen', 'Okafor']
+
+# Relative frequencies for synthetic_roster(): a few courses hold most
+# students, grades bunch around B/C and students are mostly 18-23
+COURSE_WEIGHTS = {'Computer Science': 24, 'Engineering': 18, 'Economics': 13, 'Biology': 11,
+                  'Mathematics': 10, 'Physics': 7, 'Chemistry': 6, 'History': 5,
+                  'Literature': 3, 'Philosophy': 3}
+GRADE_WEIGHTS = {'A': 14, 'B': 27, 'C': 24, 'D': 10, 'F': 5, None: 20}
+AGE_WEIGHTS = {age: (30 if 18 <= age <= 23 else 8 if age <= 28 else 2) for age in range(17, 41)}
+# Most students start in September or January, a few in any other month
+MONTH_WEIGHTS = {1: 20, 2: 4, 3: 2, 4: 2, 5: 1, 6: 1, 7: 2, 8: 6, 9: 45, 10: 8, 11: 3, 12: 1}
+ROSTER_CHUNK = 100000
+
+
+class LegacyStudent:
+    """Student as it was before __slots__, kept for comparison"""
+    def __init__(self, student_id, name, age, email, phone, course, grade=None):
+        self.student_id = student_id
+        self.name = name
+        self.age = age
+        self.email = email
+        self.phone = phone
+        self.course = course
+        self.grade = grade
+        self.enrollment_date = datetime.now().strftime("%Y-%m-%d")
+
+
+def synthetic_fields(count, seed=42):
+    """Yield constructor arguments for count plausible students"""
+    rng = random.Random(seed)
+    for i in range(1, count + 1):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        yield (f"STU{i:03d}", f"{first} {last}", rng.randint(17, 40),
+               f"{first.lower()}.{last.lower()}{i}@example.edu", f"+1{rng.randint(10**9, 10**10 - 1)}",
+               # Build a fresh string, as json.loads would, so interning matters
+               ''.join(list(rng.choice(COURSES))), rng.choice(GRADES))
+
+
+def measure_memory(cls, count):
+    """Bytes still allocated after building count instances of cls in a dict"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    rows = list(synthetic_fields(count))
+    students = {row[0]: cls(*row) for row in rows}
+    del rows  # Only what the roster itself keeps alive is counted
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    assert len(students) == count
+    return after - before
+
+
+def bench_memory(args):
+    """Compare bytes per student for the old and the __slots__ Student"""
+    print(f"Memory per student ({args.count} records, strings included):")
+    results = {}
+    for label, cls in (('legacy (__dict__)', LegacyStudent), ('Student (__slots__)', Student)):
+        total = measure_memory(cls, args.count)
+        results[label] = total / args.count
+        print(f"  {label:<22} {total / args.count:8.1f} bytes/student  ({total / 1024 / 1024:.1f} MB)")
+    legacy, compact = results.values()
+    print(f"  Saving: {(1 - compact / legacy) * 100:.1f}%")
+
+
+def linear_search(students, term):
+    """The original search_student matching loop"""
+    term = term.lower()
+    return [s for s in students.values()
+            if term in s.student_id.lower() or term in s.name.lower()]
+
+
+def time_call(func, *args, repeat=5):
+    """Best wall-clock time of func(*args) in seconds, and its result"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_search(args):
+    """Indexed search vs the original linear scan"""
+    students = {row[0]: Student(*row) for row in synthetic_fields(args.count)}
+    start = time.perf_counter()
+    index = SearchIndex(students.values())
+    print(f"Built index over {args.count} students in {time.perf_counter() - start:.2f}s")
+
+    # Same fields as search_student; the index returns the top 10
+    fields = ('student_id', 'name')
+    queries = [f"STU{args.count // 2:03d}", f"{args.count // 3}", 'zara oka', 'ivanova']
+    print(f"{'query':<16} {'matches':>8} {'linear ms':>10} {'index ms':>10}")
+    for query in queries:
+        scan_time, scan = time_call(linear_search, students, query, repeat=args.repeat)
+        index_time, _ = time_call(index.search, query, fields, 10, repeat=args.repeat)
+        assert len(index.search(query, fields)) == len(scan)
+        print(f"{query:<16} {len(scan):>8} {scan_time * 1000:>10.2f} {index_time * 1000:>10.3f}")
+
+
+def legacy_clean_record(record):
+    """The per-row checks as they were, with patterns passed to re.match as strings"""
+    values = {field: str(record.get(field) or '').strip()
+              for field in ('name', 'age', 'email', 'phone', 'course', 'grade')}
+    values['grade'] = values['grade'].upper()
+    problems = []
+    if not values['name']:
+        problems.append("Name cannot be empty")
+    if not values['age'].isdigit() or not 5 <= int(values['age']) <= 100:
+        problems.append("Age must be a number between 5 and 100")
+    if re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', values['email']) is None:
+        problems.append(f"Invalid email format: {values['email']!r}")
+    if re.match(r'^\+?[0-9]{10,15}$', values['phone']) is None:
+        problems.append(f"Invalid phone number: {values['phone']!r}")
+    if not values['course']:
+        problems.append("Course cannot be empty")
+    if values['grade'] and values['grade'] not in ['A', 'B', 'C', 'D', 'F']:
+        problems.append(f"Invalid grade: {values['grade']!r}")
+    return values, problems
+
+
+def synthetic_records(count, bad_ratio, seed=7):
+    """Import-style string records, about bad_ratio of them invalid in one field"""
+    rng = random.Random(seed)
+    records = []
+    for _, name, age, email, phone, course, grade in synthetic_fields(count, seed):
+        record = {'name': name, 'age': str(age), 'email': f"new.{email}", 'phone': phone,
+                  'course': course, 'grade': grade or ''}
+        if rng.random() < bad_ratio:
+            field = rng.choice(['age', 'email', 'phone', 'grade'])
+            record[field] = {'age': '150', 'email': 'not-an-email', 'phone': '12-34', 'grade': 'Z'}[field]
+        records.append(record)
+    return records
+
+
+def bench_validation(args):
+    """Per-row legacy checks vs column-wise validation with duplicate detection"""
+    contacts = ContactIndex(Student(*row) for row in synthetic_fields(args.roster))
+    records = synthetic_records(args.count, args.bad_ratio)
+    records[-1]['email'] = records[0]['email']  # One in-batch duplicate
+
+    def legacy():
+        return [position for position, record in enumerate(records) if legacy_clean_record(record)[1]]
+
+    legacy_time, legacy_bad = time_call(legacy, repeat=args.repeat)
+    column_time, (_, found) = time_call(validation.validate_records, records, repeat=args.repeat)
+    full_time, (_, problems) = time_call(validation.validate_records, records, contacts, repeat=args.repeat)
+    assert sorted(found) == legacy_bad and set(legacy_bad) < set(problems)
+    print(f"{args.count} records ({len(problems)} invalid) against a roster of {args.roster}")
+    print(f"  legacy per-row             {args.count / legacy_time:>12,.0f} rows/s")
+    print(f"  column-wise                {args.count / column_time:>12,.0f} rows/s  "
+          f"({legacy_time / column_time:.1f}x)")
+    print(f"  column-wise + duplicates   {args.count / full_time:>12,.0f} rows/s")
+
+
+def cold_report(data_file, func, *args, repeat=3):
+    """Best time of func(students, *args) on a freshly loaded roster (nothing decoded yet), and its result"""
+    best = None
+    for _ in range(repeat):
+        system = StudentManagementSystem(data_file)
+        try:
+            start = time.perf_counter()
+            result = func(system.students, *args)
+            elapsed = time.perf_counter() - start
+        finally:
+            system.storage.close()
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def bench_reports(args):
+    """Serial vs process-pool statistics and course listing, from a cold data file as the menu runs them"""
+    workdir = tempfile.mkdtemp(prefix='sms_reports_')
+    data_file = os.path.join(workdir, 'students.' + {'json': 'json', 'binary': 'bin', 'sqlite': 'db'}[args.format])
+    write_roster(data_file, args.count)
+    serial_stats, expected_stats = cold_report(
+        data_file, lambda students: reports.shard_statistics(students.values()), repeat=args.repeat)
+    serial_course, expected_course = cold_report(
+        data_file, lambda students: reports.shard_by_course(students.values()), repeat=args.repeat)
+    print(f"{args.count} students ({args.format}), {os.cpu_count()} CPU(s)")
+    print(f"{'workers':>8} {'statistics s':>13} {'speedup':>8} {'by course s':>12} {'speedup':>8}")
+    print(f"{'serial':>8} {serial_stats:>13.3f} {1:>8.2f} {serial_course:>12.3f} {1:>8.2f}")
+    workers = 1
+    while workers <= args.max_workers:
+        stats_time, stats = cold_report(data_file, reports.parallel_statistics, workers, repeat=args.repeat)
+        course_time, by_course = cold_report(data_file, reports.parallel_by_course, workers, repeat=args.repeat)
+        assert stats == expected_stats and by_course == expected_course
+        print(f"{workers:>8} {stats_time:>13.3f} {serial_stats / stats_time:>8.2f} "
+              f"{course_time:>12.3f} {serial_course / course_time:>8.2f}")
+        workers *= 2
+    shutil.rmtree(workdir)
+
+
+def bench_snapshot(args):
+    """File size, cold start and lookups: JSON snapshot vs binary mmap snapshot"""
+    workdir = tempfile.mkdtemp(prefix='sms_snapshot_')
+    students = [Student(*row) for row in synthetic_fields(args.count)]
+    rng = random.Random(1)
+    lookups = [students[rng.randrange(args.count)].student_id for _ in range(1000)]
+    print(f"{args.count} students")
+    print(f"{'format':<8} {'size MB':>9} {'open + 1 lookup ms':>19} {'1000 lookups ms':>16} {'full scan s':>12}")
+    for fmt in ('json', 'binary'):
+        data_file = os.path.join(workdir, 'students.' + ('bin' if fmt == 'binary' else 'json'))
+        storage = open_backend(data_file, Student.from_dict)
+        storage.load()
+        storage.copy_from(students)
+        storage.close()
+
+        def cold_start():
+            system = StudentManagementSystem(data_file)
+            system.students[lookups[0]]
+            return system
+
+        start_time, system = time_call(cold_start, repeat=args.repeat)
+        lookup_time, _ = time_call(lambda: [system.students[sid] for sid in lookups], repeat=1)
+        scan_time, _ = time_call(lambda: sum(1 for _ in system.students.values()), repeat=1)
+        system.storage.close()
+        print(f"{fmt:<8} {os.path.getsize(data_file) / 1024 / 1024:>9.1f} {start_time * 1000:>19.1f} "
+              f"{lookup_time * 1000:>16.1f} {scan_time:>12.2f}")
+    shutil.rmtree(workdir)
+
+
+def _stress_worker(data_file, backend, worker, increments, adds, counters):
+    """Increment shared counters (retrying on conflict) and add students"""
+    system = StudentManagementSystem(data_file, backend)
+    if hasattr(system.storage, 'compact_threshold'):
+        system.storage.compact_threshold = 64 * 1024  # Exercise compaction too
+    rng = random.Random(worker)
+    done = conflicts = 0
+    added = []
+    while done < increments or len(added) < adds:
+        system.storage.refresh()
+        try:
+            if len(added) < adds and rng.random() < 0.2:
+                student = Student(system.generate_student_id(), f"Worker {worker}", 20,
+                                  "worker@example.edu", "+10000000000", "Stress")
+                system._put_student(student)
+                added.append(student.student_id)
+            elif done < increments:
+                student = system.students[f"STU{rng.randint(1, counters):03d}"]
+                student.name = f"Counter {int(student.name.split()[1]) + 1}"
+                system._put_student(student)
+                done += 1
+        except ConflictError:
+            conflicts += 1
+    system.storage.close()
+    return done, conflicts, added
+
+
+def bench_concurrency(args):
+    """Parallel writer processes on one data file; fails on any lost update"""
+    workdir = tempfile.mkdtemp(prefix='sms_stress_')
+    data_file = os.path.join(workdir, 'students.' + {'sqlite': 'db', 'binary': 'bin'}.get(args.backend, 'json'))
+    system = StudentManagementSystem(data_file, args.backend)
+    for _ in range(args.counters):
+        system._put_student(Student(system.generate_student_id(), "Counter 0", 20,
+                                    "counter@example.edu", "+10000000000", "Stress"))
+    system.storage.close()
+
+    start = time.perf_counter()
+    with multiprocessing.Pool(args.workers) as pool:
+        results = pool.starmap(_stress_worker, [
+            (data_file, args.backend, worker, args.increments, args.adds, args.counters)
+            for worker in range(args.workers)
+        ])
+    elapsed = time.perf_counter() - start
+
+    system = StudentManagementSystem(data_file, args.backend)
+    total = sum(int(system.students[f"STU{i:03d}"].name.split()[1]) for i in range(1, args.counters + 1))
+    added = [sid for _, _, ids in results for sid in ids]
+    conflicts = sum(conflict for _, conflict, _ in results)
+    roster_size = len(system.students)
+    system.storage.close()
+    expected = args.workers * args.increments
+    print(f"{args.workers} writers x {args.increments} increments on {args.counters} shared records "
+          f"({args.backend}) in {elapsed:.2f}s, {conflicts} conflicts retried")
+    print(f"Counter total: {total} (expected {expected})")
+    print(f"Students added: {len(added)}, unique IDs: {len(set(added))}, "
+          f"roster size: {roster_size} (expected {args.counters + len(added)})")
+    assert total == expected, "lost updates"
+    assert len(set(added)) == len(added) == args.workers * args.adds, "duplicate student IDs"
+    assert roster_size == args.counters + len(added), "lost inserts"
+    shutil.rmtree(workdir)
+    print("✅ No lost updates")
+
+
+def _weighted(rng, weights, count):
+    """count values drawn from {value: weight}"""
+    return rng.choices(list(weights), cum_weights=list(itertools.accumulate(weights.values())), k=count)
+
+
+def synthetic_dates(rng, years, count):
+    """count YYYY-MM-DD enrollment dates over the last ``years`` full years, later years busier"""
+    first_year = datetime.now().year - years
+    year_weights = {first_year + offset: offset + 1 for offset in range(years)}
+    return [f"{year}-{month:02d}-{day:02d}" for year, month, day in
+            zip(_weighted(rng, year_weights, count), _weighted(rng, MONTH_WEIGHTS, count),
+                (rng.randint(1, 28) for _ in range(count)))]
+
+
+def synthetic_roster(count, seed=42, years=None):
+    """Yield count Students with skewed course, grade and age distributions.
+
+    With ``years`` enrollment dates are spread over that many years instead
+    of all being today. Fields are drawn a chunk at a time, so memory stays
+    flat however many students are generated.
+    """
+    rng = random.Random(seed)
+    for first_id in range(1, count + 1, ROSTER_CHUNK):
+        size = min(ROSTER_CHUNK, count + 1 - first_id)
+        courses = _weighted(rng, COURSE_WEIGHTS, size)
+        grades = _weighted(rng, GRADE_WEIGHTS, size)
+        ages = _weighted(rng, AGE_WEIGHTS, size)
+        dates = synthetic_dates(rng, years, size) if years else itertools.repeat(None)
+        for i, course, grade, age, enrolled in zip(range(first_id, first_id + size), courses, grades, ages, dates):
+            first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            yield Student(f"STU{i:03d}", f"{first} {last}", age,
+                          f"{first.lower()}.{last.lower()}{i}@example.edu",
+                          f"+1{rng.randint(10**9, 10**10 - 1)}", course, grade, enrolled)
+
+
+def write_roster(data_file, count, seed=42, backend=None, years=None):
+    """Fill a new data file with a synthetic roster; the format follows the extension"""
+    storage = open_backend(data_file, Student.from_dict, backend)
+    try:
+        storage.load()
+        storage.copy_from(synthetic_roster(count, seed, years))
+        storage.save_all()
+    finally:
+        storage.close()
+    IdAllocator(data_file).reserve(count)  # Next generated ID follows the roster
+
+
+def bench_generate(args):
+    """Write a synthetic roster to a data file"""
+    if os.path.exists(args.data_file):
+        raise SystemExit(f"{args.data_file} already exists")
+    start = time.perf_counter()
+    write_roster(args.data_file, args.count, args.seed, years=args.years)
+    print(f"Wrote {args.count} students to {args.data_file} in {time.perf_counter() - start:.1f}s "
+          f"({os.path.getsize(args.data_file) / 1024 / 1024:.1f} MB)")
+
+
+def peak_rss():
+    """This process's resident set high-water mark in bytes, or None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024  # Linux reports KiB
+
+
+class SuiteRecorder:
+    """Collects per-step timings for one roster size, and per-step traced memory peaks if asked.
+
+    The RSS high-water mark only ever grows over the process, so it is
+    recorded once for the whole size rather than under each step.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.seconds = {}
+        self.traced_peak_mb = {} if trace_memory else None
+
+    @contextlib.contextmanager
+    def step(self, name, calls=1):
+        """Time the body; seconds are per call when it makes several calls"""
+        if self.traced_peak_mb is not None:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        yield
+        self.seconds[name] = (time.perf_counter() - start) / calls
+        if self.traced_peak_mb is not None:
+            self.traced_peak_mb[name] = round(tracemalloc.get_traced_memory()[1] / 1024 / 1024, 1)
+
+    def result(self):
+        rss = peak_rss()
+        result = {'seconds': self.seconds, 'peak_rss_mb': round(rss / 1024 / 1024, 1) if rss is not None else None}
+        if self.traced_peak_mb is not None:
+            result['traced_peak_mb'] = self.traced_peak_mb
+        return result
+
+
+def suite_case(size, fmt, seed, trace_memory):
+    """Run every suite step against one synthetic roster; returns its results"""
+    workdir = tempfile.mkdtemp(prefix='sms_suite_')
+    data_file = os.path.join(workdir, 'students.' + {'sqlite': 'db', 'binary': 'bin'}.get(fmt, 'json'))
+    recorder = SuiteRecorder(trace_memory)
+    if trace_memory:
+        tracemalloc.start()
+    devnull = open(os.devnull, 'w')
+    try:
+        with recorder.step('generate_roster'):
+            write_roster(data_file, size, seed)
+        file_size = os.path.getsize(data_file)
+
+        with recorder.step('load_data'):
+            system = StudentManagementSystem(data_file)
+        with recorder.step('load_data_full'):
+            for _ in system.students.values():  # Lazy backends parse records here
+                pass
+
+        ids = 100
+        with recorder.step('generate_student_id', calls=ids):
+            for _ in range(ids):
+                system.generate_student_id()
+
+        # search_student's matching: the index build, then queries as the menu sends them
+        fields = ('student_id', 'name')
+        queries = [f"STU{size // 2:03d}", f"{size // 3}", 'maria', 'zara oka', 'ivanova']
+        with recorder.step('search_index_build'):
+            system.search_index
+        with recorder.step('search_student', calls=len(queries)):
+            for query in queries:
+                system.search(query, fields)
+
+        with recorder.step('report_aggregates_build'):
+            system.aggregates
+        with recorder.step('enrollment_table_build'):
+            system.enrollments
+        with contextlib.redirect_stdout(devnull):
+            for name in ('report_by_course', 'report_by_grade', 'report_without_grades',
+                         'report_statistics'):
+                with recorder.step(name):
+                    getattr(system, name)()
+
+        for export_format in ('txt', 'csv', 'jsonl'):
+            with recorder.step(f'export_to_file_{export_format}'):
+                system.export(os.path.join(workdir, f'export.{export_format}'), export_format)
+
+        with recorder.step('save_data'):
+            system.save_data()
+        system.storage.close()
+    finally:
+        devnull.close()
+        if trace_memory:
+            tracemalloc.stop()
+        shutil.rmtree(workdir)
+    return dict(size=size, data_file_mb=round(file_size / 1024 / 1024, 1), **recorder.result())
+
+
+def git_revision():
+    """Commit the suite ran against, marked '-dirty' with local changes; None outside git"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=here,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=here,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('-dirty' if dirty else '')
+
+
+def bench_suite(args):
+    """Time the main operations on synthetic rosters of several sizes, as JSON"""
+    sizes = [int(size) for size in args.sizes.split(',')]
+    report = {
+        'commit': git_revision(),
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'format': args.format,
+        'seed': args.seed,
+        'results': [],
+    }
+    for size in sizes:
+        print(f"Roster of {size} students ({args.format})...", file=sys.stderr, flush=True)
+        # A fresh process per size, so memory high-water marks are per size
+        with multiprocessing.Pool(1) as pool:
+            result = pool.apply(suite_case, (size, args.format, args.seed, args.trace_memory))
+        report['results'].append(result)
+        slowest = sorted(result['seconds'].items(), key=lambda item: -item[1])[:3]
+        print("  slowest: " + ", ".join(f"{name} {seconds:.3f}s" for name, seconds in slowest),
+              file=sys.stderr)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text + "\n")
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+
+def _peak_rss_mb(result):
+    """A suite result's peak RSS; files from before it was per size hold one per step"""
+    peak = result.get('peak_rss_mb') or 0
+    return max(peak.values(), default=0) if isinstance(peak, dict) else peak
+
+
+def bench_compare(args):
+    """Compare two suite result files; exits non-zero if any step slowed past the threshold"""
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+    with open(args.current) as file:
+        current = json.load(file)
+    print(f"baseline {baseline.get('commit')}  vs  current {current.get('commit')}")
+    before = {result['size']: result for result in baseline['results']}
+    regressions = 0
+    for result in current['results']:
+        old = before.get(result['size'])
+        if old is None:
+            continue
+        print(f"\n{result['size']} students")
+        print(f"{'step':<28} {'baseline s':>11} {'current s':>11} {'ratio':>7}")
+        for name, seconds in result['seconds'].items():
+            old_seconds = old['seconds'].get(name)
+            if not old_seconds:
+                continue
+            ratio = seconds / old_seconds
+            slower = ratio > 1 + args.threshold and seconds - old_seconds > args.min_seconds
+            regressions += slower
+            print(f"{name:<28} {old_seconds:>11.4f} {seconds:>11.4f} {ratio:>6.2f}x"
+                  + ("  ❌" if slower else ""))
+        old_rss, rss = _peak_rss_mb(old), _peak_rss_mb(result)
+        print(f"{'peak RSS MB':<28} {old_rss:>11.1f} {rss:>11.1f}")
+    if regressions:
+        raise SystemExit(f"\n{regressions} step(s) more than {args.threshold:.0%} slower")
+    print("\n✅ No regressions")
+
+
+def _read_until(stream, marker):
+    """Read a child's output until marker has appeared; False if it exits first"""
+    seen = b''
+    while marker not in seen:
+        chunk = os.read(stream.fileno(), 65536)
+        if not chunk:
+            return False
+        seen = seen[-len(marker):] + chunk
+    return True
+
+
+def menu_startup(data_file, background):
+    """Seconds from launch to the menu's prompt, and to the first report (System Statistics)"""
+    main_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+    command = [sys.executable, main_py, '--data', data_file] + (['--background-load'] if background else [])
+    env = dict(os.environ, PYTHONUNBUFFERED='1')  # Prompts reach the pipe as soon as they are printed
+    start = time.perf_counter()
+    child = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                             stderr=subprocess.DEVNULL, cwd=os.path.dirname(data_file), env=env)
+    try:
+        if not _read_until(child.stdout, b'Enter your choice'):
+            raise SystemExit(f"main.py exited before showing the menu for {data_file}")
+        to_menu = time.perf_counter() - start
+        child.stdin.write(b'9\n')
+        child.stdin.flush()
+        if not _read_until(child.stdout, b'Total Students:'):
+            raise SystemExit(f"main.py exited before showing statistics for {data_file}")
+        to_report = time.perf_counter() - start
+        child.communicate(b'\n0\n')
+    finally:
+        if child.poll() is None:
+            child.kill()
+            child.wait()
+    return to_menu, to_report
+
+
+def bench_startup(args):
+    """Time to the first menu prompt, loading the roster up front vs in the background"""
+    workdir = tempfile.mkdtemp(prefix='sms_startup_')
+    main_dir = os.path.dirname(os.path.abspath(__file__))
+    interpreter, _ = time_call(lambda: subprocess.run([sys.executable, '-c', 'pass'], check=True),
+                               repeat=args.repeat)
+    imports, _ = time_call(lambda: subprocess.run([sys.executable, '-c', 'import main'], cwd=main_dir,
+                                                  check=True), repeat=args.repeat)
+    print(f"Python startup {interpreter * 1000:.0f} ms, import main {(imports - interpreter) * 1000:.0f} ms more")
+    print(f"{'students':>10} {'load':<11} {'to menu s':>10} {'to first report s':>18}")
+    extension = {'json': 'json', 'binary': 'bin', 'sqlite': 'db'}[args.format]
+    for size in (int(size) for size in args.sizes.split(',')):
+        data_file = os.path.join(workdir, f"students_{size}.{extension}")
+        write_roster(data_file, size)
+        for background in (False, True):
+            runs = [menu_startup(data_file, background) for _ in range(args.repeat)]
+            to_menu = min(run[0] for run in runs)
+            to_report = min(run[1] for run in runs)
+            print(f"{size:>10} {'background' if background else 'up front':<11} {to_menu:>10.3f} {to_report:>18.3f}")
+    shutil.rmtree(workdir)
+
+
+def bench_dates(args):
+    """Date-range queries and monthly cohorts: enrollment-date index vs scanning the roster"""
+    workdir = tempfile.mkdtemp(prefix='sms_dates_')
+    data_file = os.path.join(workdir, 'students.' + {'json': 'json', 'binary': 'bin', 'sqlite': 'db'}[args.format])
+    write_roster(data_file, args.count, years=args.years)
+    system = StudentManagementSystem(data_file)
+    stored = {student.student_id: student.enrollment_date for student in synthetic_roster(args.count, years=args.years)}
+    assert all(stored[sid] == student.enrollment_date for sid, student in system.students.items()), \
+        "enrollment dates changed on load"
+    build_time, _ = time_call(lambda: system.sorted_index('enrolled'), repeat=1)
+    course_build_time, _ = time_call(lambda: system.sorted_index('enrolled', ('course',)), repeat=1)
+    dates = sorted(set(stored.values()))
+    print(f"{args.count} students enrolled over {args.years} years ({len(dates)} distinct dates, {args.format}); "
+          f"index built in {build_time:.2f}s (+{course_build_time:.2f}s per course)")
+
+    def scan_between(start, end):
+        return [student for student in system.students.values() if start <= student.enrollment_date <= end]
+
+    last = date.fromisoformat(dates[-1])
+    print(f"\n{'range':<10} {'students':>9} {'index ms':>10} {'scan ms':>10} {'speedup':>8}")
+    for label, days in (('1 day', 0), ('1 week', 6), ('1 month', 29), ('1 year', 364)):
+        start, end = (last - timedelta(days=days)).isoformat(), last.isoformat()
+        indexed, found = time_call(system.enrolled_between, start, end, repeat=args.repeat)
+        scanned, expected = time_call(scan_between, start, end, repeat=args.repeat)
+        assert {s.student_id for s in found} == {s.student_id for s in expected}, label
+        print(f"{label:<10} {len(found):>9} {indexed * 1000:>10.2f} {scanned * 1000:>10.1f} {scanned / indexed:>7.0f}x")
+
+    def scan_cohorts(course=None):
+        months = collections.Counter(student.enrollment_date[:7] for student in system.students.values()
+                                     if course is None or student.course == course)
+        return sorted(months.items())
+
+    course = next(iter(COURSE_WEIGHTS))
+    print(f"\n{'cohorts':<18} {'months':>7} {'index ms':>10} {'scan ms':>10} {'speedup':>8}")
+    for label, selected in (('all students', None), (course, course)):
+        indexed, cohorts = time_call(system.enrollment_cohorts, None, None, selected, repeat=args.repeat)
+        scanned, expected = time_call(scan_cohorts, selected, repeat=args.repeat)
+        assert [cohort for cohort in cohorts if cohort[1]] == expected, label
+        print(f"{label:<18} {len(cohorts):>7} {indexed * 1000:>10.2f} {scanned * 1000:>10.1f} {scanned / indexed:>7.0f}x")
+    system.storage.close()
+    shutil.rmtree(workdir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    memory = subparsers.add_parser('memory', help='bytes per Student before/after __slots__')
+    memory.add_argument('--count', type=int, default=100000)
+    memory.set_defaults(func=bench_memory)
+
+    search = subparsers.add_parser('search', help='indexed search vs linear scan')
+    search.add_argument('--count', type=int, default=1000000)
+    search.add_argument('--repeat', type=int, default=3)
+    search.set_defaults(func=bench_search)
+
+    parallel = subparsers.add_parser('reports', help='report scaling across worker processes')
+    parallel.add_argument('--count', type=int, default=1000000)
+    parallel.add_argument('--max-workers', type=int, default=os.cpu_count())
+    parallel.add_argument('--format', choices=['json', 'binary', 'sqlite'], default='json')
+    parallel.add_argument('--repeat', type=int, default=3)
+    parallel.set_defaults(func=bench_reports)
+
+    check = subparsers.add_parser('validation', help='bulk validation throughput in rows/s')
+    check.add_argument('--count', type=int, default=200000)
+    check.add_argument('--roster', type=int, default=100000)
+    check.add_argument('--bad-ratio', type=float, default=0.05)
+    check.add_argument('--repeat', type=int, default=3)
+    check.set_defaults(func=bench_validation)
+
+    snap = subparsers.add_parser('snapshot', help='JSON vs binary snapshot size and cold start')
+    snap.add_argument('--count', type=int, default=200000)
+    snap.add_argument('--repeat', type=int, default=3)
+    snap.set_defaults(func=bench_snapshot)
+
+    stress = subparsers.add_parser('concurrency', help='parallel writers, asserts no lost updates')
+    stress.add_argument('--backend', choices=['json', 'binary', 'sqlite'], default='json')
+    stress.add_argument('--workers', type=int, default=4)
+    stress.add_argument('--increments', type=int, default=200)
+    stress.add_argument('--adds', type=int, default=50)
+    stress.add_argument('--counters', type=int, default=5)
+    stress.set_defaults(func=bench_concurrency)
+
+    generate = subparsers.add_parser('generate', help='write a synthetic roster to a data file')
+    generate.add_argument('data_file', help='new .json, .bin or .db file')
+    generate.add_argument('--count', type=int, default=100000)
+    generate.add_argument('--seed', type=int, default=42)
+    generate.add_argument('--years', type=int, help='spread enrollment dates over this many years')
+    generate.set_defaults(func=bench_generate)
+
+    suite = subparsers.add_parser('suite', help='time load/save/search/reports/export per roster size, as JSON')
+    suite.add_argument('--sizes', default='10000,100000',
+                       help='comma-separated roster sizes, e.g. 10000,100000,1000000,10000000')
+    suite.add_argument('--format', choices=['json', 'binary', 'sqlite'], default='json')
+    suite.add_argument('--seed', type=int, default=42)
+    suite.add_argument('--trace-memory', action='store_true',
+                       help='also record Python allocation peaks per step (slows every step)')
+    suite.add_argument('--output', '-o', help='write the JSON here instead of stdout')
+    suite.set_defaults(func=bench_suite)
+
+    compare = subparsers.add_parser('compare', help='diff two suite result files')
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    compare.add_argument('--threshold', type=float, default=0.10, help='allowed slowdown, 0.10 = 10%%')
+    compare.add_argument('--min-seconds', type=float, default=0.005,
+                         help='ignore slowdowns smaller than this many seconds')
+    compare.set_defaults(func=bench_compare)
+
+    dates = subparsers.add_parser('dates', help='enrollment date ranges and monthly cohorts, index vs scan')
+    dates.add_argument('--count', type=int, default=1000000)
+    dates.add_argument('--years', type=int, default=5)
+    dates.add_argument('--format', choices=['json', 'binary', 'sqlite'], default='json')
+    dates.add_argument('--repeat', type=int, default=3)
+    dates.set_defaults(func=bench_dates)
+
+    startup = subparsers.add_parser('startup', help='time to the first menu prompt, with and without background loading')
+    startup.add_argument('--sizes', default='10000,1000000', help='comma-separated roster sizes')
+    startup.add_argument('--format', choices=['json', 'binary', 'sqlite'], default='json')
+    startup.add_argument('--repeat', type=int, default=3)
+    startup.set_defaults(func=bench_startup)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""Course enrollments with grade history, kept beside the roster.
+
+A student's ``course`` and ``grade`` are their primary enrollment. Further
+courses and every grade change are events appended to
+``<data_file>.enrollments`` (JSON Lines), so the roster keeps one small
+record per student however many courses they take. EnrollmentTable joins
+both into (student_id, course) -> Enrollment with per-course and
+per-(course, grade) indexes, so course and grade reports cost O(output).
+"""
+import json
+import os
+from operator import itemgetter
+
+from storage import append_locked
+
+
+class Enrollment:
+    __slots__ = ('student_id', 'course', 'grade', 'primary', 'enrolled')
+
+    def __init__(self, student_id, course, grade=None, primary=False, enrolled=None):
+        self.student_id = student_id
+        self.course = course
+        self.grade = grade
+        self.primary = primary  # The student's own course field; cannot be dropped
+        self.enrolled = enrolled
+
+    def to_dict(self, history=()):
+        return {
+            'course': self.course,
+            'grade': self.grade,
+            'primary': self.primary,
+            'enrolled': self.enrolled,
+            'history': [{'date': date, 'from': previous, 'to': grade} for date, previous, grade in history],
+        }
+
+
+class EnrollmentLog:
+    """Append-only JSON Lines file of enrollment events.
+
+    Events are {"op": "enroll" | "grade" | "drop", "student_id", "course",
+    "date"[, "grade", "previous"]}. Each append is one locked, fsynced
+    write, and read_new() returns only what was added since the last call,
+    so several processes can share the log.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._offset = 0
+        self._scanned = 0  # Bytes has_enrollments() has looked through
+        self._enrolled = False
+
+    def has_enrollments(self):
+        """Whether an 'enroll' event (a further course) has ever been logged.
+
+        Grade events alone do not count. Only bytes added since the last
+        call are scanned, and undecoded, so asking again is cheap.
+        """
+        if not self._enrolled:
+            try:
+                with open(self.path, 'rb') as file:
+                    file.seek(self._scanned)
+                    data = file.read()
+            except FileNotFoundError:
+                return False
+            end = data.rfind(b'\n') + 1  # A line still being written is looked at next time
+            self._scanned += end
+            self._enrolled = b'"op":"enroll"' in data[:end]
+        return self._enrolled
+
+    def exists(self):
+        return os.path.exists(self.path) and os.path.getsize(self.path) > 0
+
+    def rewind(self):
+        """Read from the start again on the next read_new()"""
+        self._offset = 0
+
+    def append(self, events):
+        if not events:
+            return
+        append_locked(self.path, ''.join(json.dumps(event, separators=(',', ':')) + '\n'
+                                         for event in events).encode('utf-8'))
+
+    def read_new(self):
+        """Events appended since the last call, oldest first"""
+        try:
+            if os.path.getsize(self.path) <= self._offset:
+                return []
+            with open(self.path, 'rb') as file:
+                file.seek(self._offset)
+                data = file.read()
+        except FileNotFoundError:
+            return []
+        end = data.rfind(b'\n') + 1  # Leave a line still being written for next time
+        self._offset += end
+        return [json.loads(line) for line in data[:end].splitlines() if line.strip()]
+
+
+class EnrollmentTable:
+    """(student_id, course) -> Enrollment, with course and grade indexes.
+
+    Kept in sync with the roster through update()/remove() like the other
+    indexes (that covers primary enrollments) and fed the enrollment log
+    through apply(). Groups are dicts used as insertion-ordered sets;
+    ``ordered()`` lists them in roster order.
+    """
+
+    def __init__(self, students=(), events=()):
+        self.records = {}          # (student_id, course) -> Enrollment
+        self.by_course = {}        # course -> {student_id: None}
+        self.by_course_grade = {}  # (course, grade or None) -> {student_id: None}
+        self.by_grade = {}         # grade or None -> {(student_id, course): None}
+        self._primary = {}         # student_id -> primary course
+        self._others = {}          # student_id -> {other course: None}, only for those who have one
+        self._history = {}         # student_id -> {course: [(date, previous, grade)]}, kept across drops
+        self._seq = {}             # student_id -> position in roster order
+        for student in students:
+            self.update(student)
+        self.apply_all(events)
+
+    def __len__(self):
+        return len(self.records)
+
+    def _add(self, enrollment):
+        student_id, course = enrollment.student_id, enrollment.course
+        self.records[(student_id, course)] = enrollment
+        self.by_course.setdefault(course, {})[student_id] = None
+        self._index_grade(enrollment)
+        if not enrollment.primary:
+            self._others.setdefault(student_id, {})[course] = None
+
+    def _discard(self, student_id, course):
+        enrollment = self.records.pop((student_id, course), None)
+        if enrollment is None:
+            return
+        self._unindex_grade(enrollment)
+        self._leave(self.by_course, course, student_id)
+        if not enrollment.primary:
+            self._leave(self._others, student_id, course)
+
+    def _index_grade(self, enrollment):
+        key = (enrollment.student_id, enrollment.course)
+        self.by_course_grade.setdefault((enrollment.course, enrollment.grade), {})[enrollment.student_id] = None
+        self.by_grade.setdefault(enrollment.grade, {})[key] = None
+
+    def _unindex_grade(self, enrollment):
+        self._leave(self.by_course_grade, (enrollment.course, enrollment.grade), enrollment.student_id)
+        self._leave(self.by_grade, enrollment.grade, (enrollment.student_id, enrollment.course))
+
+    def _set_grade(self, enrollment, grade):
+        if enrollment.grade != grade:
+            self._unindex_grade(enrollment)
+            enrollment.grade = grade
+            self._index_grade(enrollment)
+
+    @staticmethod
+    def _leave(groups, key, member):
+        members = groups[key]
+        del members[member]
+        if not members:
+            del groups[key]
+
+    def update(self, student):
+        """Track a new or changed student's primary enrollment"""
+        student_id, course, grade = student.student_id, student.course, student.grade or None
+        old = self._primary.get(student_id)
+        if old is None:
+            self._seq[student_id] = len(self._seq)
+        elif old != course:
+            # Changing course keeps the old one, grade and all, as a further enrollment
+            previous = self.records.get((student_id, old))
+            if previous is not None:
+                previous.primary = False
+                self._others.setdefault(student_id, {})[old] = None
+        self._primary[student_id] = course
+        enrollment = self.records.get((student_id, course))
+        if enrollment is None:
+            self._add(Enrollment(student_id, course, grade, True, student.enrollment_date))
+        else:
+            if not enrollment.primary:
+                self._leave(self._others, student_id, course)
+                enrollment.primary = True
+            self._set_grade(enrollment, grade)
+
+    def remove(self, student_id):
+        """Forget a deleted student's enrollments"""
+        for course in list(self._others.get(student_id, ())):
+            self._discard(student_id, course)
+        course = self._primary.pop(student_id, None)
+        if course is not None:
+            self._discard(student_id, course)
+        self._history.pop(student_id, None)
+        self._seq.pop(student_id, None)
+
+    def apply(self, event):
+        """Apply one enrollment log event"""
+        student_id, course = event['student_id'], event['course']
+        if student_id not in self._primary:
+            return  # Deleted since, or not yet seen by this process
+        enrollment = self.records.get((student_id, course))
+        op = event['op']
+        if op == 'enroll':
+            if enrollment is None:
+                self._add(Enrollment(student_id, course, event.get('grade'), False, event['date']))
+        elif op == 'drop':
+            if enrollment is not None and not enrollment.primary:
+                self._discard(student_id, course)
+        elif op == 'grade':
+            history = self._history.setdefault(student_id, {}).setdefault(course, [])
+            history.append((event['date'], event.get('previous'), event.get('grade')))
+            if enrollment is not None and not enrollment.primary:  # Primary grades come from the roster
+                self._set_grade(enrollment, event.get('grade'))
+
+    def apply_all(self, events):
+        for event in events:
+            self.apply(event)
+
+    def enrollment(self, student_id, course):
+        return self.records.get((student_id, course))
+
+    def history(self, student_id, course):
+        """Grade changes in a course as (date, previous, grade), oldest first"""
+        return self._history.get(student_id, {}).get(course, [])
+
+    def courses_of(self, student_id):
+        """A student's enrollments, primary course first"""
+        courses = list(self._others.get(student_id, ()))
+        if student_id in self._primary:
+            courses.insert(0, self._primary[student_id])
+        return [self.records[(student_id, course)] for course in courses]
+
+    def members(self, course, grade=...):
+        """Student IDs in a course (with a grade, None for ungraded), in roster order"""
+        if grade is ...:
+            return self.ordered(self.by_course.get(course, ()))
+        return self.ordered(self.by_course_grade.get((course, grade), ()))
+
+    def ordered(self, student_ids):
+        return sorted(student_ids, key=self._seq.__getitem__)
+
+    def ordered_pairs(self, pairs):
+        """(student_id, course) pairs in roster order, then by course"""
+        pairs = list(pairs)
+        positions = map(self._seq.__getitem__, map(itemgetter(0), pairs))
+        return list(map(itemgetter(1), sorted(zip(positions, pairs))))
@@ -0,0 +1,124 @@
+import csv
+import gzip
+import io
+import json
+import sys
+import time
+from datetime import datetime
+
+FORMATS = ('txt', 'csv', 'jsonl')
+FIELDS = ['student_id', 'name', 'age', 'email', 'phone', 'course', 'grade', 'enrollment_date']
+CHUNK_RECORDS = 5000      # Records formatted per write
+BUFFER_SIZE = 1 << 20     # 1 MiB file buffer
+
+
+def iter_students(students, course=None):
+    """Yield students, optionally only those in one course"""
+    for student in students.values():
+        if course is None or student.course == course:
+            yield student
+
+
+def _txt_header(total):
+    return ("=" * 60 + "\n"
+            + "STUDENT MANAGEMENT SYSTEM - EXPORT\n"
+            + f"Export Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+            + "=" * 60 + "\n\n"
+            + f"Total Students: {total}\n\n")
+
+
+def _txt_chunk(students):
+    return ''.join(
+        f"Student ID: {student.student_id}\n"
+        f"Name: {student.name}\n"
+        f"Age: {student.age}\n"
+        f"Email: {student.email}\n"
+        f"Phone: {student.phone}\n"
+        f"Course: {student.course}\n"
+        f"Grade: {student.grade if student.grade else 'Not Assigned'}\n"
+        f"Enrollment Date: {student.enrollment_date}\n"
+        + "-" * 40 + "\n\n"
+        for student in students
+    )
+
+
+def _csv_chunk(students):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows([student.student_id, student.name, student.age, student.email,
+                      student.phone, student.course, student.grade or '', student.enrollment_date]
+                     for student in students)
+    return buffer.getvalue()
+
+
+def _jsonl_chunk(students):
+    return ''.join(json.dumps(student.to_dict()) + "\n" for student in students)
+
+
+def _chunks(students, size):
+    chunk = []
+    for student in students:
+        chunk.append(student)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _open_output(path, compress):
+    if path == '-':
+        raw = sys.stdout.buffer
+        return gzip.GzipFile(fileobj=raw, mode='wb') if compress else raw, False
+    if compress:
+        return gzip.open(path, 'wb', compresslevel=6), True
+    return open(path, 'wb', buffering=BUFFER_SIZE), True
+
+
+def export_students(students, path, fmt='txt', course=None, compress=False, total=None):
+    """Stream students to path ('-' for stdout) in the given format.
+
+    Students are pulled through a generator and formatted CHUNK_RECORDS at
+    a time, so memory stays flat however large the roster is. ``total`` is
+    only needed for the txt header when filtering by course. Returns a dict
+    with records, bytes (uncompressed), seconds, records_per_sec and mb_per_sec.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    format_chunk = {'txt': _txt_chunk, 'csv': _csv_chunk, 'jsonl': _jsonl_chunk}[fmt]
+    if fmt == 'txt' and total is None:
+        total = len(students) if course is None else sum(1 for _ in iter_students(students, course))
+
+    start = time.perf_counter()
+    records = 0
+    written = 0
+    output, owned = _open_output(path, compress)
+    try:
+        if fmt == 'txt':
+            header = _txt_header(total)
+        elif fmt == 'csv':
+            header = ','.join(FIELDS) + "\r\n"
+        else:
+            header = ''
+        data = header.encode('utf-8')
+        output.write(data)
+        written += len(data)
+        for chunk in _chunks(iter_students(students, course), CHUNK_RECORDS):
+            data = format_chunk(chunk).encode('utf-8')
+            output.write(data)
+            written += len(data)
+            records += len(chunk)
+    finally:
+        if owned or compress:
+            output.close()  # A GzipFile over stdout leaves stdout itself open
+        else:
+            output.flush()
+
+    seconds = max(time.perf_counter() - start, 1e-9)
+    return {
+        'records': records,
+        'bytes': written,
+        'seconds': seconds,
+        'records_per_sec': records / seconds,
+        'mb_per_sec': written / seconds / (1024 * 1024),
+    }
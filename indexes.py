@@ -0,0 +1,437 @@
+import heapq
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from datetime import date
+from operator import methodcaller
+
+
+def trigrams(text):
+    """All distinct 3-character substrings of text"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    """In-memory substring index over student ID, name and email.
+
+    Each field has an exact-value hash and a trigram -> posting list of
+    document numbers (compact ``array('I')``). A query is answered from the
+    rarest of its trigrams and each candidate is checked against the stored
+    value, so the cost follows the match count instead of the roster size.
+    Changing a student appends a new document and tombstones the old one;
+    tombstones are purged by a rebuild once they outnumber live documents.
+    """
+
+    FIELDS = ('student_id', 'name', 'email')
+    EXACT, PREFIX, SUBSTRING = 3, 2, 1
+
+    def __init__(self, students=()):
+        self._reset()
+        for student in students:
+            self.update(student)
+
+    def _reset(self):
+        self._docs = []     # doc number -> student_id, None once stale
+        self._values = []   # doc number -> lowercased field values
+        self._doc_of = {}   # student_id -> current doc number
+        self._dead = 0
+        self._postings = {field: {} for field in self.FIELDS}
+        self._exact = {field: {} for field in self.FIELDS}
+
+    def __len__(self):
+        return len(self._doc_of)
+
+    def update(self, student):
+        """Index a new or changed student"""
+        values = tuple(getattr(student, field).lower() for field in self.FIELDS)
+        doc = self._doc_of.get(student.student_id)
+        if doc is not None:
+            if self._values[doc] == values:
+                return
+            self.remove(student.student_id)
+        self._add(student.student_id, values)
+
+    def _add(self, student_id, values):
+        doc = len(self._docs)
+        self._docs.append(student_id)
+        self._values.append(values)
+        self._doc_of[student_id] = doc
+        for field, value in zip(self.FIELDS, values):
+            self._exact[field].setdefault(value, set()).add(student_id)
+            postings = self._postings[field]
+            for gram in trigrams(value):
+                posting = postings.get(gram)
+                if posting is None:
+                    posting = postings[gram] = array('I')
+                posting.append(doc)
+
+    def remove(self, student_id):
+        """Drop a student from the index"""
+        doc = self._doc_of.pop(student_id, None)
+        if doc is None:
+            return
+        for field, value in zip(self.FIELDS, self._values[doc]):
+            matches = self._exact[field][value]
+            matches.discard(student_id)
+            if not matches:
+                del self._exact[field][value]
+        self._docs[doc] = None
+        self._values[doc] = None
+        self._dead += 1
+        if self._dead > 1024 and self._dead > len(self._doc_of):
+            self._rebuild()
+
+    def _rebuild(self):
+        live = [(sid, values) for sid, values in zip(self._docs, self._values) if sid is not None]
+        self._reset()
+        for student_id, values in live:
+            self._add(student_id, values)
+
+    def _candidates(self, field, query):
+        if len(query) < 3:
+            return range(len(self._docs))  # Too short for trigrams: scan
+        postings = self._postings[field]
+        lists = []
+        for gram in trigrams(query):
+            posting = postings.get(gram)
+            if posting is None:
+                return ()
+            lists.append(posting)
+        return min(lists, key=len)
+
+    def search(self, query, fields=None, limit=None):
+        """Return matching student IDs, best first.
+
+        Exact matches rank above prefix matches, which rank above other
+        substring matches; ties are ordered by student ID.
+        """
+        query = query.strip().lower()
+        if not query:
+            return []
+        fields = self.FIELDS if fields is None else tuple(fields)
+        for field in fields:
+            if field not in self.FIELDS:
+                raise ValueError(f"Cannot search on field: {field}")
+
+        scores = {}
+        for field in fields:
+            position = self.FIELDS.index(field)
+            for student_id in self._exact[field].get(query, ()):
+                scores[student_id] = self.EXACT
+            for doc in self._candidates(field, query):
+                values = self._values[doc]
+                if values is None or query not in values[position]:
+                    continue
+                value = values[position]
+                if value == query:
+                    score = self.EXACT
+                elif value.startswith(query):
+                    score = self.PREFIX
+                else:
+                    score = self.SUBSTRING
+                student_id = self._docs[doc]
+                if score > scores.get(student_id, 0):
+                    scores[student_id] = score
+
+        def rank(student_id):
+            return (-scores[student_id], student_id)
+
+        if limit is None:
+            return sorted(scores, key=rank)
+        return heapq.nsmallest(limit, scores, key=rank)
+
+
+class RosterAggregates:
+    """Running groupings and totals behind the report_* methods.
+
+    Keeps course -> members, grade -> members (None for ungraded) and the
+    age sum, adjusted per change, so a report costs O(groups) or O(output)
+    instead of a pass over every student. ``ordered()`` lists a group in
+    the order students were first added, matching roster order.
+    """
+
+    GRADES = ('A', 'B', 'C', 'D', 'F')
+
+    def __init__(self, students=()):
+        self._state = {}  # student_id -> (course, grade, age) as counted
+        self._seq = {}    # student_id -> position in roster order
+        self._next_seq = 0
+        self.by_course = {}
+        self.by_grade = {grade: {} for grade in self.GRADES}
+        self.by_grade[None] = {}
+        self.age_sum = 0
+        self.ages = {}  # age -> number of students
+        for student in students:
+            self.update(student)
+
+    @property
+    def count(self):
+        return len(self._state)
+
+    @property
+    def ungraded(self):
+        return self.by_grade[None]
+
+    @staticmethod
+    def _key(student):
+        return (student.course, student.grade or None, student.age)
+
+    def update(self, student):
+        """Count a new student or move a changed one between groups"""
+        student_id = student.student_id
+        new = self._key(student)
+        old = self._state.get(student_id)
+        if old == new:
+            return
+        if old is None or old[0] != new[0]:
+            if old is not None:
+                self._leave(self.by_course, old[0], student_id)
+            self.by_course.setdefault(new[0], {})[student_id] = None
+        if old is None or old[1] != new[1]:
+            if old is not None:
+                self._leave(self.by_grade, old[1], student_id, keep_empty=True)
+            self.by_grade.setdefault(new[1], {})[student_id] = None
+        if old is None or old[2] != new[2]:
+            if old is not None:
+                self._uncount_age(old[2])
+            self.ages[new[2]] = self.ages.get(new[2], 0) + 1
+        self.age_sum += new[2] - (old[2] if old is not None else 0)
+        self._state[student_id] = new
+        if old is None:
+            self._seq[student_id] = self._next_seq
+            self._next_seq += 1
+
+    def remove(self, student_id):
+        """Stop counting a deleted student"""
+        old = self._state.pop(student_id, None)
+        if old is None:
+            return
+        self._leave(self.by_course, old[0], student_id)
+        self._leave(self.by_grade, old[1], student_id, keep_empty=True)
+        self.age_sum -= old[2]
+        self._uncount_age(old[2])
+        del self._seq[student_id]
+
+    def _uncount_age(self, age):
+        self.ages[age] -= 1
+        if not self.ages[age]:
+            del self.ages[age]
+
+    def ordered(self, members):
+        """Student IDs of a group in roster order"""
+        return sorted(members, key=self._seq.__getitem__)
+
+    @staticmethod
+    def _leave(groups, key, student_id, keep_empty=False):
+        members = groups[key]
+        del members[student_id]
+        if not members and not keep_empty:
+            del groups[key]
+
+    def verify(self, students):
+        """Recount from scratch and describe any difference from the running totals"""
+        fresh = RosterAggregates(students)
+        problems = []
+        if fresh.count != self.count:
+            problems.append(f"student count {self.count} != {fresh.count}")
+        if fresh.age_sum != self.age_sum:
+            problems.append(f"age sum {self.age_sum} != {fresh.age_sum}")
+        if fresh.ages != self.ages:
+            problems.append("age histogram differs")
+        for label, mine, theirs in (('course', self.by_course, fresh.by_course),
+                                    ('grade', self.by_grade, fresh.by_grade)):
+            for key in mine.keys() | theirs.keys():
+                if set(mine.get(key, ())) != set(theirs.get(key, ())):
+                    problems.append(f"{label} {key!r} members differ")
+        return problems
+
+
+class ContactIndex:
+    """Email and phone -> student IDs, to catch contact details already in use.
+
+    Emails are compared case-insensitively and phones without a leading '+'.
+    """
+
+    FIELDS = ('email', 'phone')
+
+    def __init__(self, students=()):
+        self._owners = {field: {} for field in self.FIELDS}
+        self._keys = {}  # student_id -> (email key, phone key) as indexed
+        for student in students:
+            self.update(student)
+
+    @staticmethod
+    def key_function(field):
+        return str.lower if field == 'email' else _strip_plus
+
+    def update(self, student):
+        """Index a new or changed student"""
+        keys = (student.email.lower(), _strip_plus(student.phone))
+        old = self._keys.get(student.student_id)
+        if old == keys:
+            return
+        if old is not None:
+            self.remove(student.student_id)
+        self._keys[student.student_id] = keys
+        for field, key in zip(self.FIELDS, keys):
+            self._owners[field].setdefault(key, set()).add(student.student_id)
+
+    def remove(self, student_id):
+        """Drop a student from the index"""
+        keys = self._keys.pop(student_id, None)
+        if keys is None:
+            return
+        for field, key in zip(self.FIELDS, keys):
+            owners = self._owners[field][key]
+            owners.discard(student_id)
+            if not owners:
+                del self._owners[field][key]
+
+    def owners_of(self, field):
+        """Normalized value -> student IDs mapping for one field (read-only)"""
+        return self._owners[field]
+
+    def owners(self, field, value, normalized=False):
+        """Student IDs using this email or phone"""
+        key = value if normalized else self.key_function(field)(value)
+        return self._owners[field].get(key, set())
+
+
+_strip_plus = methodcaller('lstrip', '+')
+
+
+class _Highest:
+    """Compares above every value, to bound a prefix range in a sorted list"""
+
+    def __lt__(self, other):
+        return False
+
+    def __gt__(self, other):
+        return True
+
+
+_HIGHEST = _Highest()
+
+_ordinals = {}  # 'YYYY-MM-DD' -> proleptic Gregorian ordinal; a roster has a few thousand distinct dates
+
+
+def date_ordinal(text):
+    """Day number of an ISO date string, so dates sort and compare as small ints"""
+    ordinal = _ordinals.get(text)
+    if ordinal is None:
+        ordinal = _ordinals[text] = date.fromisoformat(text).toordinal()
+    return ordinal
+
+
+# Sort orders for listings; ties are broken by student ID, STU999 before STU1000
+SORT_KEYS = {
+    'id': lambda student: (),
+    'name': lambda student: (student.name.lower(),),
+    'course': lambda student: (student.course,),
+    'grade': lambda student: (student.grade is None, student.grade or ''),
+    'age': lambda student: (student.age,),
+    'enrolled': lambda student: (date_ordinal(student.enrollment_date),),
+}
+
+# Fields a listing can be filtered on by index prefix
+GROUP_KEYS = {
+    'course': lambda student: student.course,
+    'grade': lambda student: student.grade or '',
+}
+
+
+class SortedIndex:
+    """Students kept sorted by optional group fields, then a sort key, then ID.
+
+    Entries are (group values..., sort values..., len(student_id),
+    student_id) tuples in one sorted list, so a filtered, sorted page is
+    a bisect plus a slice. Changes are buffered and merged into the list
+    on the next read, so bulk updates do not pay for an insertion each.
+    """
+
+    def __init__(self, sort, groups=(), students=()):
+        self.sort = sort
+        self.groups = tuple(groups)
+        self._sort_key = SORT_KEYS[sort]
+        self._group_keys = [GROUP_KEYS[field] for field in self.groups]
+        self._keys = {student.student_id: self._entry(student) for student in students}  # As indexed
+        self._entries = sorted(self._keys.values())
+        self._added = set()
+        self._removed = set()
+
+    def _entry(self, student):
+        return (tuple(key(student) for key in self._group_keys) + self._sort_key(student)
+                + (len(student.student_id), student.student_id))
+
+    def update(self, student):
+        """Index a new or changed student"""
+        entry = self._entry(student)
+        old = self._keys.get(student.student_id)
+        if old == entry:
+            return
+        if old is not None:
+            self._discard(old)
+        self._keys[student.student_id] = entry
+        if entry in self._removed:
+            self._removed.discard(entry)
+        else:
+            self._added.add(entry)
+
+    def remove(self, student_id):
+        """Drop a student from the index"""
+        old = self._keys.pop(student_id, None)
+        if old is not None:
+            self._discard(old)
+
+    def _discard(self, entry):
+        if entry in self._added:
+            self._added.discard(entry)
+        else:
+            self._removed.add(entry)
+
+    def _flush(self):
+        """Merge buffered changes into the sorted list"""
+        if not self._added and not self._removed:
+            return
+        entries = self._entries
+        if len(self._added) + len(self._removed) <= 64:
+            for entry in self._removed:
+                del entries[bisect_left(entries, entry)]
+            for entry in self._added:
+                insort(entries, entry)
+        else:
+            if self._removed:
+                entries = [entry for entry in entries if entry not in self._removed]
+            entries += sorted(self._added)
+            entries.sort()  # Two sorted runs: a linear merge
+            self._entries = entries
+        self._added = set()
+        self._removed = set()
+
+    def _bounds(self, prefix, low, high):
+        entries = self._entries
+        first = bisect_left(entries, prefix + ((low,) if low is not None else ()))
+        last = bisect_left(entries, prefix + ((high, _HIGHEST) if high is not None else (_HIGHEST,)))
+        return first, last
+
+    def count(self, prefix=(), low=None, high=None):
+        """Number of entries scan() would return for the same range, by bisection alone"""
+        self._flush()
+        first, last = self._bounds(prefix, low, high)
+        return max(last - first, 0)
+
+    def scan(self, prefix=(), after=None, descending=False, low=None, high=None, offset=0):
+        """Entries starting with prefix, in order, past the cursor entry ``after``.
+
+        ``low``/``high`` bound (inclusively) the first sort value after the
+        prefix and ``offset`` skips entries; neither walks the skipped part.
+        """
+        self._flush()
+        entries = self._entries
+        first, last = self._bounds(prefix, low, high)
+        if after is not None:
+            if descending:
+                last = min(last, bisect_left(entries, after))
+            else:
+                first = max(first, bisect_right(entries, after))
+        positions = range(last - 1, first - 1, -1) if descending else range(first, last)
+        return map(entries.__getitem__, positions[offset:])
@@ -0,0 +1,94 @@
+"""Load generator for the HTTP service started by ``python main.py serve``.
+
+Opens --connections keep-alive connections and sends a mix of GET-by-ID
+and search requests for --duration seconds, then reports requests/s and
+p50/p99/max latency. Run ``python loadgen.py --help`` for options.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from urllib.parse import quote
+
+QUERIES = ['khan', 'maria', 'smith', 'ivanova', 'zara oka', 'chen', 'STU123', 'priya.patel']
+
+
+async def request(reader, writer, method, path, body=None):
+    """Send one request on an open connection; returns (status, payload)"""
+    data = json.dumps(body).encode('utf-8') if body is not None else b""
+    writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\n"
+                 f"Content-Length: {len(data)}\r\n\r\n".encode('latin-1') + data)
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    length = 0
+    for line in head.split(b"\r\n"):
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":", 1)[1])
+    payload = await reader.readexactly(length)
+    return status, json.loads(payload) if payload else None
+
+
+async def client(args, student_ids, deadline, latencies, errors, seed):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    try:
+        while time.perf_counter() < deadline:
+            if rng.random() < args.search_ratio:
+                path = f"/students?q={quote(rng.choice(QUERIES))}&limit=10"
+            else:
+                path = f"/students/{rng.choice(student_ids)}"
+            start = time.perf_counter()
+            status, _ = await request(reader, writer, 'GET', path)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def run(args):
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    _, page = await request(reader, writer, 'GET', f"/students?limit={args.sample}")
+    writer.close()
+    student_ids = [student['student_id'] for student in page]
+    if not student_ids:
+        raise SystemExit("The roster is empty; import some students first")
+
+    latencies = []
+    errors = []
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(*(client(args, student_ids, deadline, latencies, errors, seed)
+                           for seed in range(args.connections)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"{len(latencies)} requests over {args.connections} connection(s) in {elapsed:.2f}s "
+          f"({args.search_ratio:.0%} searches)")
+    print(f"  Throughput: {len(latencies) / elapsed:,.0f} requests/s")
+    print(f"  Latency p50: {percentile(latencies, 0.50) * 1000:.2f} ms  "
+          f"p99: {percentile(latencies, 0.99) * 1000:.2f} ms  max: {latencies[-1] * 1000:.2f} ms")
+    if errors:
+        print(f"  ❌ {len(errors)} non-200 response(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--connections', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds to run")
+    parser.add_argument('--search-ratio', type=float, default=0.2,
+                        help="fraction of requests that are searches")
+    parser.add_argument('--sample', type=int, default=10000,
+                        help="student IDs fetched up front to look up")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
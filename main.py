@@ -1,18 +1,85 @@
+import argparse
+import csv
 import json
 import os
-from datetime import datetime
-import re
+import shutil
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+from itertools import islice
+import exporter
+import validation
+from enrollments import EnrollmentLog, EnrollmentTable
+from indexes import SORT_KEYS, ContactIndex, RosterAggregates, SearchIndex, SortedIndex, date_ordinal
+from storage import ConflictError, IdAllocator, open_backend
+# asyncio, multiprocessing, cProfile and the backup modules are imported where
+# they are used, so starting the menu does not pay for them
+
+GRADES = list(validation.GRADES)
+EDITABLE_FIELDS = validation.FIELDS
+
+# What the menu prints when a typed value fails validation
+PROMPT_HINTS = {
+    'name': "Name cannot be empty!",
+    'age': "Age must be a number between 5 and 100!",
+    'email': "Invalid email format! Please enter a valid email.",
+    'phone': "Invalid phone number! Please enter 10-15 digits.",
+    'course': "Course cannot be empty!",
+    'grade': "Invalid grade! Please enter A, B, C, D, or F.",
+}
+
+_today = [None, None]  # [date, formatted string] shared by all new students
+
+def today_string():
+    """Today's date as YYYY-MM-DD, formatted once per day"""
+    today = date.today()
+    if today != _today[0]:
+        _today[0] = today
+        _today[1] = today.strftime("%Y-%m-%d")
+    return _today[1]
+
+def _day(value):
+    """Day ordinal of a date or YYYY-MM-DD string; None stays None (an open end)"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, date):
+        return value.toordinal()
+    return date_ordinal(value)
 
 class Student:
-    def __init__(self, student_id, name, age, email, phone, course, grade=None):
+    # No per-instance __dict__: a roster holds hundreds of thousands of these
+    __slots__ = ('student_id', 'name', 'age', 'email', 'phone', 'course', 'grade', 'enrollment_date',
+                 'version')
+    
+    def __init__(self, student_id, name, age, email, phone, course, grade=None, enrollment_date=None):
         self.student_id = student_id
         self.name = name
         self.age = age
         self.email = email
         self.phone = phone
-        self.course = course
+        self.course = sys.intern(course)  # Course names repeat across the roster
         self.grade = grade
-        self.enrollment_date = datetime.now().strftime("%Y-%m-%d")
+        # Stored as YYYY-MM-DD; dates repeat too, so every student enrolled on a day shares one string
+        self.enrollment_date = sys.intern(enrollment_date) if enrollment_date else today_string()
+        self.version = 0  # Bumped on every save; 0 means never saved
+    
+    @classmethod
+    def from_dict(cls, data):
+        """Build a Student from a stored record"""
+        student = cls(
+            data['student_id'],
+            data['name'],
+            data['age'],
+            data['email'],
+            data['phone'],
+            data['course'],
+            data['grade'],
+            data.get('enrollment_date')
+        )
+        student.version = data.get('version', 0)
+        return student
     
     def to_dict(self):
         return {
@@ -23,118 +90,731 @@ class Student:
             'phone': self.phone,
             'course': self.course,
             'grade': self.grade,
-            'enrollment_date': self.enrollment_date
+            'enrollment_date': self.enrollment_date,
+            'version': self.version
         }
     
     def __str__(self):
         return f"ID: {self.student_id}, Name: {self.name}, Course: {self.course}, Grade: {self.grade if self.grade else 'Not Assigned'}"
 
+class ValidationError(ValueError):
+    """Raised by the batch API when records are invalid; nothing was applied"""
+    def __init__(self, problems):
+        super().__init__('; '.join(f"{key}: {', '.join(messages)}" for key, messages in problems))
+        self.problems = problems  # [(record position or student ID, [messages])]
+
 class StudentManagementSystem:
-    def __init__(self, data_file='students_data.json'):
+    def __init__(self, data_file='students_data.json', backend=None, verify_aggregates=False,
+                 report_workers=1, metrics=False, background_load=False):
         self.data_file = data_file
-        self.students = self.load_data()
+        self.storage = open_backend(data_file, Student.from_dict, backend)
+        self.metrics = None
+        if metrics:
+            from metrics import Metrics  # cProfile and tracemalloc only when asked for
+            self.metrics = Metrics()
+            self.metrics.instrument(self)  # Before loading, so the load is timed too
+        self.ids = IdAllocator(data_file)
+        self.enrollment_log = EnrollmentLog(data_file + '.enrollments')
+        # Held by the menu while it works on the roster, so a background backup sees whole changes
+        self.lock = threading.RLock()
+        self._backup_lock = threading.Lock()  # One backup at a time
+        self.change_log_path = data_file + '.changes'  # IDs written, for incremental backups
+        self._written = []  # IDs put or deleted in the current batch
+        self._events = []  # Enrollment events of the open batch, logged once it commits
+        self.backup_thread = None
+        self.backup_dir = None  # Default: <data_file>.backups
+        self._indexes = []  # In-memory indexes kept in sync with every change
+        self._search_index = None
+        self._aggregates = None
+        self._contacts = None
+        self._enrollments = None
+        self._orders = {}  # (sort, group fields) -> SortedIndex
+        # Changes other processes make reach the indexes through these
+        self.storage.on_put = self._index_student
+        self.storage.on_delete = self._unindex_student
+        self.storage.on_reload = self._drop_indexes
+        self.storage.on_commit = self._log_events
+        self.storage.on_rollback = self._forget_events
+        self._students = None
+        self._load_error = None
+        self._loaded = threading.Event()
+        if background_load:
+            # The menu shows at once; the first action that needs the roster waits for it
+            threading.Thread(target=self._load_students, args=(True,), name='roster-loader', daemon=True).start()
+        else:
+            self._load_students()
+        self.verify_aggregates = verify_aggregates  # Cross-check reports against a full recount
+        self.report_workers = report_workers  # >1: cold reports run on a process pool
+    
+    def _load_students(self, background=False):
+        try:
+            self._students = self.load_data()
+        except BaseException as e:
+            if not background:
+                raise
+            self._load_error = e  # Raised again by the first access to students
+        finally:
+            self._loaded.set()
+    
+    @property
+    def loaded(self):
+        """Whether the roster has finished loading"""
+        return self._loaded.is_set()
+    
+    @property
+    def students(self):
+        """The roster, waiting for a background load to finish if need be"""
+        if not self._loaded.is_set():
+            self._loaded.wait()
+        if self._load_error is not None:
+            raise self._load_error
+        return self._students
     
     def load_data(self):
-        """Load student data from JSON file"""
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r') as file:
-                    data = json.load(file)
-                    # Convert dictionary back to Student objects
-                    students = {}
-                    for sid, student_data in data.items():
-                        students[sid] = Student(
-                            student_data['student_id'],
-                            student_data['name'],
-                            student_data['age'],
-                            student_data['email'],
-                            student_data['phone'],
-                            student_data['course'],
-                            student_data['grade']
-                        )
-                    return students
-            except (json.JSONDecodeError, FileNotFoundError):
-                return {}
-        return {}
+        """Load student data through the storage backend"""
+        return self.storage.load()
     
     def save_data(self):
-        """Save student data to JSON file"""
-        data = {sid: student.to_dict() for sid, student in self.students.items()}
-        with open(self.data_file, 'w') as file:
-            json.dump(data, file, indent=4)
+        """Flush all student data to the backend's data file"""
+        self.storage.save_all()
+    
+    def _put_student(self, student):
+        """Persist a new or changed student and refresh the indexes"""
+        self.storage.put(student)
+        self._written.append(student.student_id)
+        self._index_student(student)
+    
+    def _delete_student(self, student_id):
+        """Delete a student from storage and the indexes"""
+        self.storage.delete(student_id)
+        self._written.append(student_id)
+        self._unindex_student(student_id)
+    
+    @contextmanager
+    def _batch(self):
+        """storage.batch(), logging the IDs written for incremental backups just before the commit"""
+        with self.storage.batch():
+            try:
+                yield
+            except BaseException:
+                self._written = []  # Rolled back, so nothing to back up
+                raise
+            written, self._written = self._written, []
+            if written and os.path.exists(self.change_log_path):
+                from backup import ChangeLog
+                ChangeLog(self.change_log_path).append(list(dict.fromkeys(written)))
+    
+    def _log_events(self):
+        """Write the enrollment events of a batch that has just been committed"""
+        events, self._events = self._events, []
+        self.enrollment_log.append(events)
+    
+    def _forget_events(self):
+        """Drop the events of a batch that was rolled back, and the table that saw its changes"""
+        self._events = []
+        self._forget_enrollments()
+    
+    def _forget_enrollments(self):
+        if self._enrollments is not None:
+            # Moving a student back would keep the undone course as a further one; rebuild on next use
+            self._indexes.remove(self._enrollments)
+            self._enrollments = None
+    
+    def _index_student(self, student):
+        for index in self._indexes:
+            index.update(student)
+    
+    def _unindex_student(self, student_id):
+        for index in self._indexes:
+            index.remove(student_id)
+    
+    def _drop_indexes(self):
+        """Forget the in-memory indexes; they are rebuilt on next use"""
+        self._indexes = []
+        self._search_index = None
+        self._aggregates = None
+        self._contacts = None
+        self._enrollments = None
+        self._orders = {}
+    
+    @property
+    def search_index(self):
+        """Search index, built on first use"""
+        if self._search_index is None:
+            self._search_index = SearchIndex(self.students.values())
+            self._indexes.append(self._search_index)
+        return self._search_index
+    
+    @property
+    def contacts(self):
+        """Email/phone index used to reject duplicates, built on first use"""
+        if self._contacts is None:
+            self._contacts = ContactIndex(self.students.values())
+            self._indexes.append(self._contacts)
+        return self._contacts
+    
+    @property
+    def aggregates(self):
+        """Running report totals, built on first use"""
+        if self._aggregates is None:
+            self._aggregates = RosterAggregates(self.students.values())
+            self._indexes.append(self._aggregates)
+        elif self.verify_aggregates:
+            problems = self._aggregates.verify(self.students.values())
+            if problems:
+                print("⚠️ Report totals were out of sync and have been recounted:")
+                for problem in problems:
+                    print(f"  - {problem}")
+                self._indexes.remove(self._aggregates)
+                self._aggregates = None
+                return self.aggregates
+        return self._aggregates
+    
+    @property
+    def enrollments(self):
+        """Enrollment table over the roster and the enrollment log, built on first use"""
+        return self._sync_enrollments()
+    
+    def _sync_enrollments(self):
+        """Build the enrollment table if needed and apply the log events it has not seen yet"""
+        if self._enrollments is None:
+            self._enrollments = EnrollmentTable(self.students.values())
+            self._indexes.append(self._enrollments)
+            self.enrollment_log.rewind()
+        self._enrollments.apply_all(self.enrollment_log.read_new())  # Includes other processes' events
+        return self._enrollments
+    
+    def sorted_index(self, sort, groups=()):
+        """Listing order for a sort key within group fields, built on first use"""
+        index = self._orders.get((sort, groups))
+        if index is None:
+            index = self._orders[(sort, groups)] = SortedIndex(sort, groups, self.students.values())
+            self._indexes.append(index)
+        return index
+    
+    def list_students(self, sort='id', descending=False, course=None, grade=None, min_age=None,
+                      max_age=None, page=0, page_size=20, after=None):
+        """One page of students in sort order; returns (students, cursor).
+        
+        ``grade=''`` selects students without a grade. Pass the returned
+        cursor as ``after`` for the next page; it is None on the last page.
+        Course and grade filters (and an age range when sorting by age) are
+        answered from an index range, so a page costs O(page_size + log N).
+        """
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Cannot sort by: {sort}")
+        filters = [(field, value) for field, value in (('course', course), ('grade', grade)) if value is not None]
+        index = self.sorted_index(sort, tuple(field for field, _ in filters))
+        prefix = tuple(value for _, value in filters)
+        by_age = sort == 'age'
+        scan_ages = not by_age and (min_age is not None or max_age is not None)
+        skip = page * page_size if after is None else 0
+        entries = index.scan(prefix, after, descending,
+                             low=min_age if by_age else None, high=max_age if by_age else None,
+                             offset=0 if scan_ages else skip)
+        if scan_ages:
+            low = min_age if min_age is not None else 0
+            high = max_age if max_age is not None else float('inf')
+            entries = (entry for entry in entries if low <= self.students[entry[-1]].age <= high)
+            entries = islice(entries, skip, None)
+        page_entries = list(islice(entries, page_size + 1))
+        cursor = page_entries[page_size - 1] if len(page_entries) > page_size else None
+        return [self.students[entry[-1]] for entry in page_entries[:page_size]], cursor
+    
+    def search(self, query, fields=None, limit=None):
+        """Return students matching query (ID, name or email), best matches first"""
+        return [self.students[sid] for sid in self.search_index.search(query, fields, limit)]
     
     def generate_student_id(self):
         """Generate a unique student ID"""
-        if not self.students:
-            return "STU001"
-        
-        # Find the highest student ID
-        max_id = 0
-        for sid in self.students.keys():
-            num = int(sid[3:])  # Extract numeric part after 'STU'
-            if num > max_id:
-                max_id = num
-        
-        new_id = max_id + 1
-        return f"STU{new_id:03d}"
+        return self.reserve_student_ids(1)[0]
+    
+    def reserve_student_ids(self, count):
+        """Reserve count unused student IDs in one step"""
+        ids = self.ids.reserve(count, self.students.keys())
+        # Skip anything already taken, e.g. if the data file was swapped
+        while any(sid in self.students for sid in ids):
+            taken = sum(1 for sid in ids if sid in self.students)
+            ids = [sid for sid in ids if sid not in self.students]
+            ids += self.ids.reserve(taken, self.students.keys())
+        return ids
     
     def validate_email(self, email):
         """Validate email format"""
-        pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        return re.match(pattern, email) is not None
+        return validation.EMAIL_PATTERN.match(email) is not None
     
     def validate_phone(self, phone):
         """Validate phone number format"""
-        pattern = r'^\+?[0-9]{10,15}$'
-        return re.match(pattern, phone) is not None
+        return validation.PHONE_PATTERN.match(phone) is not None
     
-    def add_student(self):
-        """Add a new student to the system"""
-        print("\n" + "="*50)
-        print("ADD NEW STUDENT")
-        print("="*50)
+    def field_problem(self, field, value):
+        """Describe what is wrong with a cleaned field value, or None if it is valid"""
+        return validation.field_problem(field, value)
+    
+    def validate_records(self, records, owners=None, changed=None):
+        """Clean and check records column by column, including duplicate emails/phones.
+        
+        Returns (rows, problems) as validation.validate_records() does.
+        """
+        return validation.validate_records(records, self.contacts, owners, changed)
+    
+    def clean_record(self, record):
+        """Normalize an imported record and list what is wrong with it"""
+        rows, problems = self.validate_records([record])
+        return rows[0], problems.get(0, [])
+    
+    def import_students(self, records, batch_size=10000):
+        """Add records in batches, each saved with one write.
+        
+        Returns (added, rejected) where rejected is a list of
+        (row number, problems) for rows that failed validation.
+        """
+        added = 0
+        rejected = []
+        records = iter(records)
+        offset = 0
+        while True:
+            chunk = list(islice(records, batch_size))
+            if not chunk:
+                return added, rejected
+            rows, problems = self.validate_records(chunk)
+            rejected.extend((offset + position + 1, problems[position]) for position in sorted(problems))
+            batch = [values for position, values in enumerate(rows) if position not in problems]
+            if batch:
+                added += len(self._add_batch(batch))
+            offset += len(chunk)
+    
+    def student_from_values(self, student_id, values):
+        """Build a Student from a record cleaned by clean_record()"""
+        return Student(student_id, values['name'], int(values['age']), values['email'],
+                       values['phone'], values['course'], values['grade'] or None)
+    
+    def _add_batch(self, batch):
+        ids = self.reserve_student_ids(len(batch))
+        students = [self.student_from_values(student_id, values) for student_id, values in zip(ids, batch)]
+        with self._batch():
+            for student in students:
+                self._put_student(student)
+        return students
+    
+    def assign_grades_batch(self, rows, batch_size=10000):
+        """Apply (student_id, grade) rows in batches; returns (updated, rejected)"""
+        updated = 0
+        rejected = []
+        grades = {}
+        for row_number, row in enumerate(rows, 1):
+            problem = validation.record_problem(row)
+            if problem:
+                rejected.append((row_number, [problem]))
+                continue
+            student_id = str(row.get('student_id') or '').strip().upper()
+            grade = str(row.get('grade') or '').strip().upper()
+            if student_id not in self.students:
+                rejected.append((row_number, [f"Student with ID {student_id} not found"]))
+                continue
+            if self.field_problem('grade', grade):
+                rejected.append((row_number, [self.field_problem('grade', grade)]))
+                continue
+            grades[student_id] = grade or None
+            updated += 1
+            if len(grades) >= batch_size:
+                self.assign_grades(grades)
+                grades = {}
+        if grades:
+            self.assign_grades(grades)
+        return updated, rejected
+    
+    # Batch API: each call validates everything first, then applies and
+    # persists all of it with one storage batch, or raises and changes nothing
+    
+    def create_students(self, records):
+        """Add new students from dict records; returns the created Students"""
+        batch, problems = self.validate_records(list(records))
+        if problems:
+            raise ValidationError(sorted(problems.items()))
+        return self._add_batch(batch) if batch else []
+    
+    def update_many(self, changes):
+        """Apply {student_id: {field: value}} changes; returns the updated Students.
         
-        # Generate student ID
-        student_id = self.generate_student_id()
+        ``changes`` may also be (student_id, fields) pairs. A change may
+        carry the 'version' it was based on, in which case a ConflictError
+        is raised if the student has been saved since.
+        """
+        changes = dict(changes)
+        mark = len(self._events)
+        table = None
+        try:
+            with self._batch():
+                students = []
+                records = []
+                problems = []
+                for student_id, fields in changes.items():
+                    if student_id not in self.students:
+                        problems.append((student_id, [f"Student with ID {student_id} not found"]))
+                        continue
+                    student = self.students[student_id]
+                    if 'version' in fields and fields['version'] != student.version:
+                        raise ConflictError(f"Student {student_id} has version {student.version}, "
+                                            f"not {fields['version']}")
+                    unknown = [field for field in fields if field not in EDITABLE_FIELDS and field != 'version']
+                    if unknown:
+                        problems.append((student_id, [f"Unknown field: {field!r}" for field in unknown]))
+                    record = student.to_dict()
+                    record.update((field, value) for field, value in fields.items() if field in EDITABLE_FIELDS)
+                    students.append(student)
+                    records.append(record)
+                # Only the changed fields are checked, so older records stay editable
+                rows, found = self.validate_records(
+                    records, owners=[student.student_id for student in students],
+                    changed=[set(changes[student.student_id]) for student in students])
+                problems += [(students[position].student_id, found[position]) for position in sorted(found)]
+                if problems:
+                    raise ValidationError(problems)
+                updates = list(zip(students, rows))
+                if self._enrollments is not None or self.enrollment_log.has_enrollments():
+                    if any(values['course'] != student.course for student, values in updates):
+                        table = self.enrollments  # Only further courses can already hold the new one
+                self._apply_updates(updates, changes, table)
+        except BaseException:
+            # Rolling back put the Students back; their events and enrollment table changes go too
+            del self._events[mark:]
+            if table is not None:
+                self._forget_enrollments()
+            raise
+        return [student for student, _ in updates]
+    
+    def _apply_updates(self, updates, changes, table):
+        """Set and save the cleaned values of update_many().
+        
+        Its grade history is queued in self._events and only logged once
+        the outermost batch commits.
+        """
+        events = self._events
+        for student, values in updates:
+            self.storage.before_change(student)
+            course, grade = sys.intern(values['course']), values['grade'] or None
+            if course == student.course:
+                previous = student.grade
+            else:
+                # The old course stays on as a further enrollment with its grade;
+                # the new one keeps the grade it has, unless a grade is given too
+                enrollment = table.enrollment(student.student_id, course) if table else None
+                previous = enrollment.grade if enrollment else None
+                if 'grade' not in changes[student.student_id]:
+                    grade = previous
+                events.append({'op': 'enroll', 'student_id': student.student_id, 'course': student.course,
+                               'grade': student.grade, 'date': student.enrollment_date})
+            if grade != previous:
+                events.append({'op': 'grade', 'student_id': student.student_id, 'course': course,
+                               'grade': grade, 'previous': previous, 'date': today_string()})
+            student.name = values['name']
+            student.age = int(values['age'])
+            student.email = values['email']
+            student.phone = values['phone']
+            student.course = course
+            student.grade = grade
+            self._put_student(student)
+    
+    def assign_grades(self, grades):
+        """Set {student_id: grade} (None or '' clears it); returns the updated Students"""
+        return self.update_many({student_id: {'grade': grade} for student_id, grade in dict(grades).items()})
+    
+    def delete_students(self, student_ids):
+        """Remove students by ID; returns how many were deleted"""
+        student_ids = list(dict.fromkeys(student_ids))
+        with self._batch():
+            missing = [(sid, [f"Student with ID {sid} not found"]) for sid in student_ids if sid not in self.students]
+            if missing:
+                raise ValidationError(missing)
+            for student_id in student_ids:
+                self._delete_student(student_id)
+        return len(student_ids)
+    
+    def enroll_students(self, enrollments):
+        """Enroll students in further courses from {student_id, course[, grade]} records.
         
-        # Get student details
-        name = input("Enter student name: ").strip()
-        while not name:
-            print("Name cannot be empty!")
-            name = input("Enter student name: ").strip()
+        Everything is checked first and nothing is applied if any record is
+        invalid. Returns the new Enrollments.
+        """
+        enrollments = list(enrollments)
+        table = self.enrollments
+        problems = []
+        keys = []
+        pairs = set()  # (student_id, course) already in this batch
+        for position, record in enumerate(enrollments):
+            student_id = str(record.get('student_id') or '').strip().upper()
+            course = str(record.get('course') or '').strip()
+            grade = str(record.get('grade') or '').strip().upper()
+            found = [problem for problem in (self.field_problem('course', course),
+                                             self.field_problem('grade', grade)) if problem]
+            if student_id not in self.students:
+                found.append(f"Student with ID {student_id} not found")
+            elif table.enrollment(student_id, course) is not None or (student_id, course) in pairs:
+                found.append(f"Student {student_id} is already enrolled in {course}")
+            if found:
+                problems.append((position, found))
+            keys.append((student_id, course, grade or None))
+            pairs.add((student_id, course))
+        if problems:
+            raise ValidationError(problems)
+        self.enrollment_log.append([
+            {'op': 'enroll', 'student_id': student_id, 'course': sys.intern(course), 'grade': grade,
+             'date': today_string()}
+            for student_id, course, grade in keys])
+        table = self.enrollments
+        return [table.enrollment(student_id, course) for student_id, course, _ in keys]
+    
+    def grade_enrollments(self, grades):
+        """Set {(student_id, course): grade} (None or '' clears it); returns the Enrollments"""
+        grades = {(student_id, course): str(grade or '').strip().upper()
+                  for (student_id, course), grade in dict(grades).items()}
+        table = self.enrollments
+        problems = []
+        for (student_id, course), grade in grades.items():
+            problem = self.field_problem('grade', grade)
+            found = [problem] if problem else []
+            if table.enrollment(student_id, course) is None:
+                found.append(f"Student {student_id} is not enrolled in {course}")
+            if found:
+                problems.append((f"{student_id}/{course}", found))
+        if problems:
+            raise ValidationError(problems)
+        # Primary courses live on the student record; update_many logs their history
+        primary = {student_id: grade for (student_id, course), grade in grades.items()
+                   if table.enrollment(student_id, course).primary}
+        if primary:
+            self.assign_grades(primary)
+        self.enrollment_log.append([
+            {'op': 'grade', 'student_id': student_id, 'course': course, 'grade': grade or None,
+             'previous': table.enrollment(student_id, course).grade, 'date': today_string()}
+            for (student_id, course), grade in grades.items()
+            if not table.enrollment(student_id, course).primary])
+        table = self.enrollments
+        return [table.enrollment(student_id, course) for student_id, course in grades]
+    
+    def drop_enrollments(self, pairs):
+        """Withdraw students from further courses given (student_id, course) pairs"""
+        pairs = list(dict.fromkeys(pairs))
+        table = self.enrollments
+        problems = []
+        for student_id, course in pairs:
+            enrollment = table.enrollment(student_id, course)
+            if enrollment is None:
+                problems.append((f"{student_id}/{course}", [f"Student {student_id} is not enrolled in {course}"]))
+            elif enrollment.primary:
+                problems.append((f"{student_id}/{course}",
+                                 [f"{course} is {student_id}'s main course; change the student's course instead"]))
+        if problems:
+            raise ValidationError(problems)
+        self.enrollment_log.append([{'op': 'drop', 'student_id': student_id, 'course': course,
+                                     'date': today_string()} for student_id, course in pairs])
+        self._sync_enrollments()  # The drops show in the table straight away
+        return len(pairs)
+    
+    def students_in_course(self, course, grade=...):
+        """Students enrolled in course, optionally only with grade ('' or None: ungraded)"""
+        table = self.enrollments
+        members = table.members(course) if grade is ... else table.members(course, grade or None)
+        return [self.students[sid] for sid in members]
+    
+    def _enrollment_order(self, course=None):
+        """The enrollment-date index, within course if given, and the prefix selecting it"""
+        if course is None:
+            return self.sorted_index('enrolled'), ()
+        return self.sorted_index('enrolled', ('course',)), (course,)
+    
+    def enrolled_between(self, start=None, end=None, course=None, limit=None):
+        """Students enrolled from start to end inclusive (dates or YYYY-MM-DD), oldest first.
         
-        age = input("Enter student age: ").strip()
-        while not age.isdigit() or int(age) < 5 or int(age) > 100:
-            print("Age must be a number between 5 and 100!")
-            age = input("Enter student age: ").strip()
+        Answered from the enrollment-date index in O(log N + k); ``course``
+        is the students' own course field.
+        """
+        index, prefix = self._enrollment_order(course)
+        entries = index.scan(prefix, low=_day(start), high=_day(end))
+        return [self.students[entry[-1]] for entry in islice(entries, limit)]
+    
+    def count_enrolled_between(self, start=None, end=None, course=None):
+        """How many students enrolled_between() would return, without walking them"""
+        index, prefix = self._enrollment_order(course)
+        return index.count(prefix, low=_day(start), high=_day(end))
+    
+    def enrollment_cohorts(self, start=None, end=None, course=None):
+        """[(YYYY-MM, students enrolled that month)] from start's month to end's, empty months included.
         
-        email = input("Enter student email: ").strip()
-        while not self.validate_email(email):
-            print("Invalid email format! Please enter a valid email.")
-            email = input("Enter student email: ").strip()
+        Each month is two bisections of the enrollment-date index, so the
+        cost is O(months * log N) however many students there are.
+        """
+        index, prefix = self._enrollment_order(course)
+        low, high = _day(start), _day(end)
+        if low is None or high is None:
+            first = next(index.scan(prefix), None)
+            if first is None:
+                return []
+            last = next(index.scan(prefix, descending=True))
+            low = first[len(prefix)] if low is None else low
+            high = last[len(prefix)] if high is None else high
+        cohorts = []
+        month = date.fromordinal(low).replace(day=1)
+        while month.toordinal() <= high:
+            following = month.replace(year=month.year + month.month // 12, month=month.month % 12 + 1)
+            count = index.count(prefix, low=max(month.toordinal(), low),
+                                high=min(following.toordinal() - 1, high))
+            cohorts.append((month.strftime('%Y-%m'), count))
+            month = following
+        return cohorts
+    
+    def convert(self, target, backend=None):
+        """Copy every student, IDs and versions kept, into a new data file; returns the count"""
+        if os.path.exists(target):
+            raise FileExistsError(f"{target} already exists")
+        storage = open_backend(target, Student.from_dict, backend)
+        try:
+            storage.load()
+            storage.copy_from(self.students.values())
+            storage.save_all()
+        finally:
+            storage.close()
+        if os.path.exists(self.ids.path):
+            # Keep the ID high-water mark so deleted students' IDs stay retired
+            shutil.copyfile(self.ids.path, IdAllocator(target).path)
+        if self.enrollment_log.exists():
+            shutil.copyfile(self.enrollment_log.path, target + '.enrollments')
+        return len(self.students)
+    
+    def backup_store(self, directory=None):
+        from backup import BackupStore
+        return BackupStore(directory or self.backup_dir or self.data_file + '.backups')
+    
+    def backup(self, full=False, directory=None):
+        """Back up the roster and return the backup's manifest.
         
-        phone = input("Enter student phone number: ").strip()
-        while not self.validate_phone(phone):
-            print("Invalid phone number! Please enter 10-15 digits.")
-            phone = input("Enter student phone number: ").strip()
+        Incremental unless ``full`` or there is nothing to build on: the
+        change log lists the IDs written since the previous backup, so only
+        those records are read and written, whatever the roster's size.
+        """
+        from backup import MAX_CHAIN, ChangeLog
+        started = time.perf_counter()
+        store = self.backup_store(directory)
+        log = ChangeLog(self.change_log_path)
+        with self._backup_lock:
+            parent = None if full else store.latest()
+            if parent is not None and (parent.get('changes') is None or log.size() < parent['changes'][1]
+                                       or len(store.chain(parent)) >= MAX_CHAIN):
+                parent = None  # No change log to build on, or it was replaced
+            if parent is None:
+                with self.lock:
+                    # Full backups stream the roster, so the lock is held until done
+                    log.create()
+                    end = log.size()
+                    self.storage.refresh()
+                    return store.write(None, (student.to_dict() for student in self.students.values()),
+                                       (), len(self.students), self.ids.high_water(),
+                                       self.enrollment_log.path, (end, end), started)
+            
+            # IDs logged since the parent, plus those of the parent's own window again:
+            # a batch logged just before the parent was taken may have committed after it
+            parent_start, parent_end = parent['changes']
+            end = log.size()
+            new = log.read(parent_end, end)
+            again = log.read(parent_start, parent_end) - new
+            stored = parent.get('versions') or {}
+            with self.lock:
+                self.storage.refresh()
+                students = self.students
+                records = []
+                deleted = []
+                for student_id in new | again:
+                    if student_id in students:
+                        student = students[student_id]
+                        if student_id not in again or stored.get(student_id) != student.version:
+                            records.append(student.to_dict())
+                    elif student_id not in again or student_id not in parent['deleted']:
+                        deleted.append(student_id)
+                count = len(students)
+            return store.write(parent, records, deleted, count, self.ids.high_water(),
+                               self.enrollment_log.path, (parent_end, end), started)
+    
+    def start_backups(self, interval=None):
+        """Run backups on a background thread, every interval seconds if given"""
+        if self.backup_thread is None:
+            from backup import BackupThread
+            self.backup_thread = BackupThread(self.backup, interval)
+            self.backup_thread.start()
+        return self.backup_thread
+    
+    def restore(self, target, at=None, directory=None, backend=None):
+        """Rebuild the roster as of epoch time ``at`` (default: latest backup) into a new data file.
         
-        course = input("Enter course name: ").strip()
-        while not course:
-            print("Course cannot be empty!")
-            course = input("Enter course name: ").strip()
+        Returns (manifest used, number of students restored).
+        """
+        if os.path.exists(target):
+            raise FileExistsError(f"{target} already exists")
+        store = self.backup_store(directory)
+        manifest = store.latest(at)
+        if manifest is None:
+            raise ValueError("No backup was taken at or before that time")
+        records = store.records_at(manifest)
+        storage = open_backend(target, Student.from_dict, backend)
+        try:
+            storage.load()
+            storage.copy_from(Student.from_dict(record) for record in records.values())
+            storage.save_all()
+        finally:
+            storage.close()
+        if manifest['id_high_water'] is not None:
+            with open(IdAllocator(target).path, 'w') as file:
+                file.write(f"{manifest['id_high_water']}\n")
+        log = store.enrollment_log_at(manifest)
+        if log:
+            with open(target + '.enrollments', 'wb') as file:
+                file.write(log)
+        return manifest, len(records)
+    
+    def export(self, path, fmt='txt', course=None, compress=False):
+        """Stream students to path ('-' for stdout); returns throughput stats"""
+        total = None
+        if fmt == 'txt' and course is not None and self._aggregates is not None:
+            # Only the txt header needs the count; without built aggregates the exporter counts
+            total = len(self._aggregates.by_course.get(course, ()))
+        return exporter.export_students(self.students, path, fmt, course, compress, total)
+    
+    def _prompt(self, prompt, field, student_id=None):
+        """Ask for a field until it passes validation and is not another student's contact"""
+        while True:
+            value = input(prompt).strip()
+            if self.field_problem(field, value):
+                print(PROMPT_HINTS[field])
+                continue
+            if field in ContactIndex.FIELDS:
+                owners = self.contacts.owners(field, value) - {student_id}
+                if owners:
+                    print(f"That {field} is already used by {', '.join(sorted(owners))}!")
+                    continue
+            return value
+    
+    def add_student(self):
+        """Add a new student to the system"""
+        print("\n" + "="*50)
+        print("ADD NEW STUDENT")
+        print("="*50)
         
-        # Create new student object
-        student = Student(student_id, name, int(age), email, phone, course)
-        self.students[student_id] = student
-        self.save_data()
+        record = {
+            'name': self._prompt("Enter student name: ", 'name'),
+            'age': self._prompt("Enter student age: ", 'age'),
+            'email': self._prompt("Enter student email: ", 'email'),
+            'phone': self._prompt("Enter student phone number: ", 'phone'),
+            'course': self._prompt("Enter course name: ", 'course'),
+        }
+        student = self.create_students([record])[0]
         
         print(f"\n✅ Student added successfully!")
-        print(f"Student ID: {student_id}")
-        print(f"Name: {name}")
-        print(f"Course: {course}")
+        print(f"Student ID: {student.student_id}")
+        print(f"Name: {student.name}")
+        print(f"Course: {student.course}")
     
-    def view_all_students(self):
-        """Display all students"""
+    def view_all_students(self, page_size=20):
+        """Display students a page at a time, sorted and optionally filtered"""
         print("\n" + "="*50)
         print("ALL STUDENTS")
         print("="*50)
@@ -144,11 +824,47 @@ class StudentManagementSystem:
             return
         
         print(f"Total Students: {len(self.students)}\n")
-        for student in self.students.values():
-            print(f"{student}")
-            print(f"  Age: {student.age}, Email: {student.email}")
-            print(f"  Phone: {student.phone}, Enrolled: {student.enrollment_date}")
-            print("-" * 30)
+        sort = input("Sort by - id, name, course, grade, age or enrolled (default id): ").strip().lower() or 'id'
+        if sort not in SORT_KEYS:
+            print("Invalid sort key!")
+            return
+        course = input("Only show one course (leave empty for all): ").strip() or None
+        grade = input("Only show one grade - A-F, or NONE for ungraded (leave empty for all): ").strip().upper() or None
+        if grade == 'NONE':
+            grade = ''
+        elif grade is not None and grade not in GRADES:
+            print("Invalid grade! Please enter A, B, C, D, F or NONE.")
+            return
+        ages = input("Only show an age range, e.g. 18-25 (leave empty for all): ").strip()
+        min_age = max_age = None
+        if ages:
+            low, _, high = ages.partition('-')
+            if not low.strip().isdigit() or not (high or low).strip().isdigit():
+                print("Invalid age range!")
+                return
+            min_age, max_age = int(low), int(high or low)
+        
+        cursors = [None]  # Cursor each page shown so far starts after
+        while True:
+            students, cursor = self.list_students(sort, course=course, grade=grade, min_age=min_age,
+                                                  max_age=max_age, page_size=page_size, after=cursors[-1])
+            # One write per page; printing line by line dominated large listings
+            sys.stdout.write(''.join(
+                f"{student}\n"
+                f"  Age: {student.age}, Email: {student.email}\n"
+                f"  Phone: {student.phone}, Enrolled: {student.enrollment_date}\n"
+                + "-" * 30 + "\n"
+                for student in students
+            ) or "No students match these filters.\n")
+            sys.stdout.flush()
+            
+            choice = input(f"\nPage {len(cursors)} - [N]ext, [P]revious or [Q]uit: ").strip().lower()
+            if choice in ('', 'n') and cursor is not None:
+                cursors.append(cursor)
+            elif choice == 'p' and len(cursors) > 1:
+                cursors.pop()
+            elif choice in ('', 'n', 'q'):
+                break
     
     def search_student(self):
         """Search for a student by ID or name"""
@@ -162,11 +878,7 @@ class StudentManagementSystem:
             print("Search term cannot be empty!")
             return
         
-        results = []
-        for student in self.students.values():
-            if (search_term in student.student_id.lower() or 
-                search_term in student.name.lower()):
-                results.append(student)
+        results = self.search(search_term, fields=('student_id', 'name'))
         
         if results:
             print(f"\nFound {len(results)} matching student(s):\n")
@@ -211,63 +923,25 @@ class StudentManagementSystem:
             print("Update cancelled.")
             return
         
-        if choice == 1:
-            new_name = input("Enter new name: ").strip()
-            while not new_name:
-                print("Name cannot be empty!")
-                new_name = input("Enter new name: ").strip()
-            student.name = new_name
-            print("Name updated successfully!")
-        
-        elif choice == 2:
-            new_age = input("Enter new age: ").strip()
-            while not new_age.isdigit() or int(new_age) < 5 or int(new_age) > 100:
-                print("Age must be a number between 5 and 100!")
-                new_age = input("Enter new age: ").strip()
-            student.age = int(new_age)
-            print("Age updated successfully!")
-        
-        elif choice == 3:
-            new_email = input("Enter new email: ").strip()
-            while not self.validate_email(new_email):
-                print("Invalid email format! Please enter a valid email.")
-                new_email = input("Enter new email: ").strip()
-            student.email = new_email
-            print("Email updated successfully!")
-        
-        elif choice == 4:
-            new_phone = input("Enter new phone number: ").strip()
-            while not self.validate_phone(new_phone):
-                print("Invalid phone number! Please enter 10-15 digits.")
-                new_phone = input("Enter new phone number: ").strip()
-            student.phone = new_phone
-            print("Phone number updated successfully!")
-        
-        elif choice == 5:
-            new_course = input("Enter new course: ").strip()
-            while not new_course:
-                print("Course cannot be empty!")
-                new_course = input("Enter new course: ").strip()
-            student.course = new_course
-            print("Course updated successfully!")
+        if not 1 <= choice <= 6:
+            print("Invalid choice!")
+            return
         
-        elif choice == 6:
-            new_grade = input("Enter new grade (A, B, C, D, F or leave empty): ").strip().upper()
-            if new_grade and new_grade in ['A', 'B', 'C', 'D', 'F']:
-                student.grade = new_grade
-                print("Grade updated successfully!")
-            elif new_grade == '':
-                student.grade = None
-                print("Grade cleared successfully!")
-            else:
-                print("Invalid grade! Please enter A, B, C, D, or F.")
+        field = EDITABLE_FIELDS[choice - 1]
+        if field == 'grade':
+            value = input("Enter new grade (A, B, C, D, F or leave empty): ").strip().upper()
+            if self.field_problem('grade', value):
+                print(PROMPT_HINTS['grade'])
                 return
-        
         else:
-            print("Invalid choice!")
-            return
+            label = 'phone number' if field == 'phone' else field
+            value = self._prompt(f"Enter new {label}: ", field, student_id)
         
-        self.save_data()
+        self.update_many({student_id: {field: value, 'version': student.version}})
+        if field == 'grade' and not value:
+            print("Grade cleared successfully!")
+        else:
+            print(f"{'Phone number' if field == 'phone' else field.capitalize()} updated successfully!")
     
     def delete_student(self):
         """Delete a student from the system"""
@@ -291,8 +965,7 @@ class StudentManagementSystem:
         confirmation = input("\nType 'YES' to confirm deletion: ").strip().upper()
         
         if confirmation == 'YES':
-            del self.students[student_id]
-            self.save_data()
+            self.delete_students([student_id])
             print(f"✅ Student {student_id} deleted successfully!")
         else:
             print("Deletion cancelled.")
@@ -316,16 +989,82 @@ class StudentManagementSystem:
         
         grade = input("Enter grade (A, B, C, D, F or leave empty to clear): ").strip().upper()
         
-        if grade and grade in ['A', 'B', 'C', 'D', 'F']:
-            student.grade = grade
-            self.save_data()
+        if self.field_problem('grade', grade):
+            print(PROMPT_HINTS['grade'])
+            return
+        
+        self.update_many({student_id: {'grade': grade, 'version': student.version}})
+        if grade:
             print(f"✅ Grade {grade} assigned to {student.name} successfully!")
-        elif grade == '':
-            student.grade = None
-            self.save_data()
+        else:
             print(f"✅ Grade cleared for {student.name}!")
+    
+    def manage_enrollments(self):
+        """Show a student's courses with grade history, and enroll, grade or drop courses"""
+        print("\n" + "="*50)
+        print("COURSE ENROLLMENTS")
+        print("="*50)
+        
+        student_id = input("Enter student ID: ").strip().upper()
+        
+        if student_id not in self.students:
+            print(f"Student with ID {student_id} not found!")
+            return
+        
+        student = self.students[student_id]
+        table = self.enrollments
+        print(f"\nStudent: {student.name}")
+        for enrollment in table.courses_of(student_id):
+            label = " (main course)" if enrollment.primary else ""
+            print(f"\n📚 {enrollment.course}{label} - Grade: {enrollment.grade if enrollment.grade else 'N/A'}")
+            for date, previous, grade in table.history(student_id, enrollment.course):
+                print(f"    {date}: {previous or '-'} → {grade or '-'}")
+        
+        print("\n1. Enroll in a Course")
+        print("2. Grade a Course")
+        print("3. Drop a Course")
+        action = input("\nSelect action (1-3, or leave empty to go back): ").strip()
+        if not action:
+            return
+        if action not in ('1', '2', '3'):
+            print("Invalid choice!")
+            return
+        
+        course = input("Enter course: ").strip()
+        if action == '3':
+            self.drop_enrollments([(student_id, course)])
+            print(f"✅ {student.name} dropped {course}!")
+            return
+        grade = input("Enter grade (A, B, C, D, F or leave empty for none): ").strip().upper()
+        if action == '1':
+            self.enroll_students([{'student_id': student_id, 'course': course, 'grade': grade}])
+            print(f"✅ {student.name} enrolled in {course}!")
         else:
-            print("Invalid grade! Please enter A, B, C, D, or F.")
+            self.grade_enrollments({(student_id, course): grade})
+            print(f"✅ Grade for {course} updated for {student.name}!")
+    
+    def manage_backups(self):
+        """List recent backups and start a new one in the background"""
+        print("\n" + "="*50)
+        print("BACKUPS")
+        print("="*50)
+        
+        thread = self.backup_thread
+        if thread is not None and thread.last_result is not None:
+            if isinstance(thread.last_result, Exception):
+                print(f"⚠️ The last background backup failed: {thread.last_result}")
+        manifests = self.backup_store().manifests()
+        if manifests:
+            print(f"{len(manifests)} backup(s), most recent last:\n")
+            for manifest in manifests[-10:]:
+                print(f"  {manifest['created']}  {manifest['kind']:<11} {manifest['records']} record(s) stored, "
+                      f"{len(manifest['deleted'])} deleted, {manifest['students']} students")
+        else:
+            print("No backups yet.")
+        
+        if input("\nBack up now? (y/N): ").strip().lower() == 'y':
+            self.start_backups().request()
+            print("✅ Backup started in the background; choose Backups again to see it.")
     
     def generate_report(self):
         """Generate various reports"""
@@ -337,9 +1076,12 @@ class StudentManagementSystem:
         print("2. Students by Grade")
         print("3. Students without Grades")
         print("4. Overall Statistics")
+        print("5. Students in a Course by Grade")
+        print("6. Enrollment Cohorts by Month")
+        print("7. Students Enrolled Between Two Dates")
         
         try:
-            choice = int(input("\nSelect report type (1-4): "))
+            choice = int(input("\nSelect report type (1-7): "))
         except ValueError:
             print("Invalid input!")
             return
@@ -352,17 +1094,32 @@ class StudentManagementSystem:
             self.report_without_grades()
         elif choice == 4:
             self.report_statistics()
+        elif choice == 5:
+            self.report_course_grade()
+        elif choice == 6:
+            self.report_cohorts()
+        elif choice == 7:
+            self.report_enrolled_between()
         else:
             print("Invalid choice!")
     
+    def _use_parallel_reports(self):
+        """Shard a report across processes only if no running totals exist yet"""
+        return self.report_workers > 1 and self._aggregates is None
+    
     def report_by_course(self):
         """Generate report grouped by course"""
-        courses = {}
-        for student in self.students.values():
-            course = student.course
-            if course not in courses:
-                courses[course] = []
-            courses[course].append(student)
+        if self._use_parallel_reports() and self._enrollments is None and not self.enrollment_log.has_enrollments():
+            # Nobody takes a second course yet, so grouping the roster is enough
+            import reports
+            courses = reports.parallel_by_course(self.students, self.report_workers)
+        else:
+            table = self.enrollments
+            records = table.records
+            courses = {}
+            for course, members in table.by_course.items():
+                courses[course] = [(self.students[sid].name, sid, records[(sid, course)].grade)
+                                   for sid in table.ordered(members)]
         
         print("\n" + "="*50)
         print("STUDENTS BY COURSE")
@@ -370,32 +1127,104 @@ class StudentManagementSystem:
         
         for course, students in courses.items():
             print(f"\n📚 {course} ({len(students)} students):")
-            for student in students:
-                print(f"  • {student.name} (ID: {student.student_id}, Grade: {student.grade if student.grade else 'N/A'})")
+            for name, student_id, grade in students:
+                print(f"  • {name} (ID: {student_id}, Grade: {grade if grade else 'N/A'})")
     
     def report_by_grade(self):
-        """Generate report grouped by grade"""
-        grades = {'A': [], 'B': [], 'C': [], 'D': [], 'F': [], 'No Grade': []}
-        
-        for student in self.students.values():
-            if student.grade:
-                grades[student.grade].append(student)
-            else:
-                grades['No Grade'].append(student)
+        """Generate report grouped by grade, one line per course enrollment"""
+        table = self.enrollments
         
         print("\n" + "="*50)
         print("STUDENTS BY GRADE")
         print("="*50)
         
-        for grade, students in grades.items():
-            if students:
-                print(f"\n📊 Grade {grade} ({len(students)} students):")
-                for student in students:
-                    print(f"  • {student.name} (ID: {student.student_id}, Course: {student.course})")
+        for grade in ['A', 'B', 'C', 'D', 'F', None]:
+            members = table.by_grade.get(grade)
+            if members:
+                print(f"\n📊 Grade {grade if grade else 'No Grade'} ({len(members)} enrollments):")
+                for sid, course in table.ordered_pairs(members):
+                    print(f"  • {self.students[sid].name} (ID: {sid}, Course: {course})")
+    
+    def report_course_grade(self):
+        """List the students in one course, optionally with one grade"""
+        course = input("Enter course: ").strip()
+        grade = input("Enter grade (A, B, C, D, F, NONE for ungraded, or leave empty for all): ").strip().upper()
+        if grade and grade != 'NONE' and self.field_problem('grade', grade):
+            print(PROMPT_HINTS['grade'])
+            return
+        
+        table = self.enrollments
+        if grade:
+            students = self.students_in_course(course, None if grade == 'NONE' else grade)
+        else:
+            students = self.students_in_course(course)
+        
+        print("\n" + "="*50)
+        print(f"{course.upper()}" + (f" - GRADE {grade}" if grade else ""))
+        print("="*50)
+        
+        if not students:
+            print("No matching students.")
+            return
+        print(f"Total: {len(students)} students\n")
+        for student in students:
+            enrollment = table.enrollment(student.student_id, course)
+            print(f"  • {student.name} (ID: {student.student_id}, "
+                  f"Grade: {enrollment.grade if enrollment.grade else 'N/A'})")
+    
+    def _prompt_date_range(self):
+        """Ask for an optional date range and course; None if a date is invalid"""
+        start = input("From date (YYYY-MM-DD, or leave empty for the first enrollment): ").strip()
+        end = input("To date (YYYY-MM-DD, or leave empty for the latest enrollment): ").strip()
+        course = input("Course (or leave empty for all): ").strip() or None
+        try:
+            _day(start), _day(end)
+        except ValueError:
+            print("Invalid date! Please use YYYY-MM-DD.")
+            return None
+        return start or None, end or None, course
+    
+    def report_cohorts(self):
+        """Count enrollments per month"""
+        selection = self._prompt_date_range()
+        if selection is None:
+            return
+        cohorts = self.enrollment_cohorts(*selection)
+        
+        print("\n" + "="*50)
+        print("ENROLLMENT COHORTS BY MONTH" + (f" - {selection[2].upper()}" if selection[2] else ""))
+        print("="*50)
+        
+        if not cohorts:
+            print("No students in the system.")
+            return
+        largest = max(count for _, count in cohorts) or 1
+        for month, count in cohorts:
+            print(f"  {month}: {count:>7} {'█' * round(count * 30 / largest)}")
+        print(f"\nTotal: {sum(count for _, count in cohorts)} students")
+    
+    def report_enrolled_between(self, limit=50):
+        """List the students who enrolled in a date range"""
+        selection = self._prompt_date_range()
+        if selection is None:
+            return
+        total = self.count_enrolled_between(*selection)
+        
+        print("\n" + "="*50)
+        print(f"STUDENTS ENROLLED {selection[0] or 'FROM THE START'} TO {selection[1] or 'NOW'}"
+              + (f" - {selection[2].upper()}" if selection[2] else ""))
+        print("="*50)
+        
+        if not total:
+            print("No matching students.")
+            return
+        print(f"Total: {total} students" + (f" (first {limit} shown)" if total > limit else "") + "\n")
+        for student in self.enrolled_between(*selection, limit=limit):
+            print(f"  • {student.enrollment_date} {student.name} (ID: {student.student_id}, Course: {student.course})")
     
     def report_without_grades(self):
         """List students without grades"""
-        students_without_grades = [s for s in self.students.values() if not s.grade]
+        students_without_grades = self.aggregates.ungraded
         
         print("\n" + "="*50)
         print("STUDENTS WITHOUT GRADES")
@@ -403,7 +1232,8 @@ class StudentManagementSystem:
         
         if students_without_grades:
             print(f"Total: {len(students_without_grades)} students\n")
-            for student in students_without_grades:
+            for sid in self.aggregates.ordered(students_without_grades):
+                student = self.students[sid]
                 print(f"  • {student.name} (ID: {student.student_id}, Course: {student.course})")
         else:
             print("All students have grades assigned!")
@@ -414,27 +1244,23 @@ class StudentManagementSystem:
         print("SYSTEM STATISTICS")
         print("="*50)
         
-        total_students = len(self.students)
+        if self._use_parallel_reports():
+            import reports
+            total_students, age_sum, grade_count, courses, ages = reports.parallel_statistics(
+                self.students, self.report_workers)
+        else:
+            aggregates = self.aggregates
+            total_students = aggregates.count
+            age_sum = aggregates.age_sum
+            grade_count = total_students - len(aggregates.ungraded)
+            courses = {course: len(members) for course, members in aggregates.by_course.items()}
+            ages = aggregates.ages
         
         if total_students == 0:
             print("No students in the system.")
             return
         
-        # Age statistics
-        ages = [s.age for s in self.students.values()]
-        avg_age = sum(ages) / len(ages)
-        
-        # Grade statistics
-        grades = [s.grade for s in self.students.values() if s.grade]
-        grade_count = len(grades)
-        
-        # Course statistics
-        courses = {}
-        for student in self.students.values():
-            if student.course in courses:
-                courses[student.course] += 1
-            else:
-                courses[student.course] = 1
+        avg_age = age_sum / total_students
         
         print(f"Total Students: {total_students}")
         print(f"Average Age: {avg_age:.1f} years")
@@ -445,40 +1271,50 @@ class StudentManagementSystem:
         for course, count in courses.items():
             percentage = (count / total_students) * 100
             print(f"  {course}: {count} students ({percentage:.1f}%)")
+        
+        print("\n🎂 Age Distribution:")
+        buckets = {}
+        for age, count in ages.items():
+            low = age // 5 * 5
+            buckets[low] = buckets.get(low, 0) + count
+        for low in sorted(buckets):
+            print(f"  {low}-{low + 4}: {buckets[low]} students")
     
     def export_to_file(self):
-        """Export student data to a text file"""
+        """Export student data to a file"""
         filename = input("Enter filename to export (without extension): ").strip()
         if not filename:
             filename = f"students_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
         
-        filename += ".txt"
+        fmt = input("Format - txt, csv or jsonl (default txt): ").strip().lower() or 'txt'
+        if fmt not in exporter.FORMATS:
+            print("Invalid format! Please enter txt, csv or jsonl.")
+            return
+        course = input("Only export one course (leave empty for all): ").strip() or None
+        compress = input("Compress with gzip? (y/N): ").strip().lower() == 'y'
+        
+        filename += f".{fmt}" + (".gz" if compress else "")
         
         try:
-            with open(filename, 'w') as file:
-                file.write("="*60 + "\n")
-                file.write("STUDENT MANAGEMENT SYSTEM - EXPORT\n")
-                file.write(f"Export Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                file.write("="*60 + "\n\n")
-                
-                file.write(f"Total Students: {len(self.students)}\n\n")
-                
-                for student in self.students.values():
-                    file.write(f"Student ID: {student.student_id}\n")
-                    file.write(f"Name: {student.name}\n")
-                    file.write(f"Age: {student.age}\n")
-                    file.write(f"Email: {student.email}\n")
-                    file.write(f"Phone: {student.phone}\n")
-                    file.write(f"Course: {student.course}\n")
-                    file.write(f"Grade: {student.grade if student.grade else 'Not Assigned'}\n")
-                    file.write(f"Enrollment Date: {student.enrollment_date}\n")
-                    file.write("-"*40 + "\n\n")
-            
+            stats = self.export(filename, fmt, course, compress)
             print(f"✅ Data exported successfully to '{filename}'!")
+            print(f"   {stats['records']} student(s), {stats['records_per_sec']:,.0f} records/s, "
+                  f"{stats['mb_per_sec']:.1f} MB/s")
         
         except Exception as e:
             print(f"Error exporting data: {e}")
     
+    def show_metrics(self):
+        """Print the performance metrics collected this session as JSON"""
+        print("\n" + "="*50)
+        print("PERFORMANCE METRICS")
+        print("="*50)
+        
+        if self.metrics is None:
+            print("Metrics are off. Start the program with --metrics or --profile to collect them.")
+            return
+        print(json.dumps(self.metrics.snapshot(self), indent=2))
+    
     def display_menu(self):
         """Display the main menu"""
         print("\n" + "="*50)
@@ -493,6 +1329,9 @@ class StudentManagementSystem:
         print("7. Generate Reports")
         print("8. Export Data to File")
         print("9. System Statistics")
+        print("10. Performance Metrics")
+        print("11. Course Enrollments")
+        print("12. Backups")
         print("0. Exit")
         print("="*50)
     
@@ -501,55 +1340,237 @@ class StudentManagementSystem:
         print("\n" + "="*50)
         print("WELCOME TO STUDENT MANAGEMENT SYSTEM")
         print("="*50)
-        print(f"Loaded {len(self.students)} student(s) from database.")
+        if self.loaded:
+            print(f"Loaded {len(self.students)} student(s) from database.")
+        else:
+            print("Loading students in the background...")
         
         while True:
             self.display_menu()
             
             try:
-                choice = int(input("\nEnter your choice (0-9): "))
+                choice = int(input("\nEnter your choice (0-12): "))
             except ValueError:
-                print("Invalid input! Please enter a number between 0 and 9.")
+                print("Invalid input! Please enter a number between 0 and 12.")
                 continue
             
             if choice == 0:
                 print("\nThank you for using Student Management System!")
                 print("Goodbye!")
+                if self.backup_thread is not None:
+                    self.backup_thread.stop()
+                self._loaded.wait()  # Never close the storage under the loader
+                self.storage.close()
                 break
             
-            elif choice == 1:
-                self.add_student()
+            try:
+                self.lock.acquire()  # Background backups wait until this action is done
+                if self.loaded:  # A load still running reads the latest data anyway
+                    self.storage.refresh()  # Pick up other users' changes
+                if choice == 1:
+                    self.add_student()
             
-            elif choice == 2:
-                self.view_all_students()
+                elif choice == 2:
+                    self.view_all_students()
             
-            elif choice == 3:
-                self.search_student()
+                elif choice == 3:
+                    self.search_student()
             
-            elif choice == 4:
-                self.update_student()
+                elif choice == 4:
+                    self.update_student()
             
-            elif choice == 5:
-                self.delete_student()
+                elif choice == 5:
+                    self.delete_student()
             
-            elif choice == 6:
-                self.assign_grade()
+                elif choice == 6:
+                    self.assign_grade()
             
-            elif choice == 7:
-                self.generate_report()
+                elif choice == 7:
+                    self.generate_report()
             
-            elif choice == 8:
-                self.export_to_file()
+                elif choice == 8:
+                    self.export_to_file()
             
-            elif choice == 9:
-                self.report_statistics()
+                elif choice == 9:
+                    self.report_statistics()
             
-            else:
-                print("Invalid choice! Please enter a number between 0 and 9.")
+                elif choice == 10:
+                    self.show_metrics()
+            
+                elif choice == 11:
+                    self.manage_enrollments()
+            
+                elif choice == 12:
+                    self.manage_backups()
+            
+                else:
+                    print("Invalid choice! Please enter a number between 0 and 12.")
+            except ConflictError as e:
+                print(f"\n⚠️ {e}. Your change was not saved; please try again.")
+            except ValidationError as e:
+                print(f"\n⚠️ {e}. Your change was not saved.")
+            finally:
+                self.lock.release()
             
             input("\nPress Enter to continue...")
 
+def read_records(path):
+    """Yield dict rows from a .csv file or a JSON Lines file"""
+    with open(path, 'r', newline='', encoding='utf-8') as file:
+        if path.lower().endswith('.csv'):
+            yield from csv.DictReader(file)
+        else:
+            for line in file:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError as e:
+                        yield validation.UnreadableRecord(f"Invalid JSON: {e}")
+
+def report_rejected(rejected):
+    """Print failed rows to stderr"""
+    for row_number, problems in rejected:
+        print(f"Row {row_number}: {'; '.join(problems)}", file=sys.stderr)
+
+def build_parser():
+    """Command-line interface; with no command the interactive menu runs"""
+    parser = argparse.ArgumentParser(description="Student Management System")
+    parser.add_argument('--data', default='students_data.json',
+                        help="data file (.json, .bin for a binary snapshot, or .db/.sqlite for SQLite)")
+    parser.add_argument('--backend', choices=['json', 'binary', 'sqlite'],
+                        help="storage backend (default: from the file extension)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="processes used for report generation (default: 1)")
+    parser.add_argument('--metrics', action='store_true',
+                        help="time and count operations (menu option 10 shows them)")
+    parser.add_argument('--profile', action='store_true',
+                        help="run under cProfile and tracemalloc and print a summary on exit")
+    parser.add_argument('--profile-output', metavar='FILE',
+                        help="with --profile, also save the raw profile to FILE")
+    parser.add_argument('--background-load', action='store_true',
+                        help="show the menu at once and load the roster in the background")
+    parser.add_argument('--backup-dir', metavar='DIR',
+                        help="where backups are kept (default: <data file>.backups)")
+    parser.add_argument('--backup-every', type=float, metavar='SECONDS',
+                        help="in the menu, back up in the background this often")
+    subparsers = parser.add_subparsers(dest='command')
+    
+    import_parser = subparsers.add_parser('import', help="add students from a CSV or JSON Lines file")
+    import_parser.add_argument('file')
+    import_parser.add_argument('--batch-size', type=int, default=10000)
+    
+    export_parser = subparsers.add_parser('export', help="stream students as CSV, JSON Lines or text")
+    export_parser.add_argument('--format', choices=exporter.FORMATS, default='csv')
+    export_parser.add_argument('-o', '--output', default='-', help="output file (default: stdout)")
+    export_parser.add_argument('--course', help="only export students in this course")
+    export_parser.add_argument('--gzip', action='store_true', help="gzip-compress the output")
+    
+    grade_parser = subparsers.add_parser('grade-batch', help="assign grades from a student_id,grade CSV")
+    grade_parser.add_argument('file')
+    grade_parser.add_argument('--batch-size', type=int, default=10000)
+    
+    convert_parser = subparsers.add_parser('convert', help="copy the roster into another data file/format")
+    convert_parser.add_argument('target', help="new data file; its extension picks the format")
+    convert_parser.add_argument('--target-backend', choices=['json', 'binary', 'sqlite'])
+    
+    serve_parser = subparsers.add_parser('serve', help="serve the roster as a local HTTP/JSON API")
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8080)
+    serve_parser.add_argument('--flush-interval', type=float, default=0.02,
+                              help="seconds between group commits of writes")
+    
+    backup_parser = subparsers.add_parser('backup', help="back up the roster (incremental when possible)")
+    backup_parser.add_argument('--full', action='store_true', help="store every record, not just changes")
+    
+    subparsers.add_parser('backups', help="list the backups taken so far")
+    
+    restore_parser = subparsers.add_parser('restore', help="rebuild the roster from backups into a new data file")
+    restore_parser.add_argument('target', help="new data file; its extension picks the format")
+    restore_parser.add_argument('--at', metavar='TIME',
+                                help="latest backup at or before this ISO time, e.g. 2024-05-01T12:00")
+    restore_parser.add_argument('--target-backend', choices=['json', 'binary', 'sqlite'])
+    return parser
+
+def main(argv=None):
+    """Run a command-line operation, or the menu when none is given"""
+    args = build_parser().parse_args(argv)
+    if not args.profile:
+        return run_command(args)
+    from metrics import profiled
+    with profiled(args.profile_output):
+        return run_command(args)
+
+def run_command(args):
+    """Open the data file and carry out the parsed command"""
+    system = StudentManagementSystem(args.data, args.backend, report_workers=args.workers,
+                                     metrics=args.metrics or args.profile,
+                                     background_load=args.background_load and args.command is None)
+    try:
+        system.backup_dir = args.backup_dir
+        if args.command is None:
+            if args.backup_every:
+                system.start_backups(args.backup_every)
+            system.run()
+        
+        elif args.command == 'import':
+            start = time.perf_counter()
+            added, rejected = system.import_students(read_records(args.file), args.batch_size)
+            report_rejected(rejected)
+            print(f"✅ Imported {added} student(s), rejected {len(rejected)} row(s) "
+                  f"in {time.perf_counter() - start:.2f}s")
+            return 1 if rejected else 0
+        
+        elif args.command == 'export':
+            stats = system.export(args.output, args.format, args.course, args.gzip)
+            print(f"✅ Exported {stats['records']} student(s) in {stats['seconds']:.2f}s "
+                  f"({stats['records_per_sec']:,.0f} records/s, {stats['mb_per_sec']:.1f} MB/s)",
+                  file=sys.stderr)
+        
+        elif args.command == 'grade-batch':
+            updated, rejected = system.assign_grades_batch(read_records(args.file), args.batch_size)
+            report_rejected(rejected)
+            print(f"✅ Updated {updated} grade(s), rejected {len(rejected)} row(s)")
+            return 1 if rejected else 0
+        
+        elif args.command == 'convert':
+            start = time.perf_counter()
+            count = system.convert(args.target, args.target_backend)
+            print(f"✅ Copied {count} student(s) to '{args.target}' in {time.perf_counter() - start:.2f}s "
+                  f"({os.path.getsize(args.target):,} bytes)")
+        
+        elif args.command == 'serve':
+            import asyncio
+            import service
+            try:
+                asyncio.run(service.serve(system, args.host, args.port, args.flush_interval))
+            except KeyboardInterrupt:
+                print("\nServer stopped.")
+        
+        elif args.command == 'backup':
+            manifest = system.backup(args.full)
+            print(f"✅ {manifest['kind'].capitalize()} backup {manifest['id']}: {manifest['records']} record(s), "
+                  f"{len(manifest['deleted'])} deletion(s), {manifest['bytes_written']:,} bytes written "
+                  f"in {manifest['seconds']:.2f}s")
+        
+        elif args.command == 'backups':
+            for manifest in system.backup_store().manifests():
+                print(f"{manifest['id']}  {manifest['created']}  {manifest['kind']:<11} "
+                      f"{manifest['records']:>9} record(s)  {manifest['students']:>9} students")
+        
+        elif args.command == 'restore':
+            at = datetime.fromisoformat(args.at).timestamp() if args.at else None
+            try:
+                manifest, count = system.restore(args.target, at, backend=args.target_backend)
+            except (FileExistsError, ValueError) as e:
+                print(f"❌ {e}", file=sys.stderr)
+                return 1
+            print(f"✅ Restored {count} student(s) as of {manifest['created']} to '{args.target}'")
+    finally:
+        if args.profile:
+            print("\nMetrics:\n" + json.dumps(system.metrics.snapshot(system), indent=2), file=sys.stderr)
+        system.storage.close()
+    return 0
+
 # Main program
 if __name__ == "__main__":
-    system = StudentManagementSystem()
-    system.run() 
\ No newline at end of file
+    sys.exit(main()) 
\ No newline at end of file
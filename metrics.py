@@ -0,0 +1,156 @@
+"""Opt-in timers and counters for StudentManagementSystem operations.
+
+Nothing is measured unless the system is created with ``metrics=True``
+(``--metrics`` or ``--profile`` on the command line). Metrics.instrument()
+then wraps the methods listed in OPERATIONS on that one instance, so a
+system without metrics runs the original methods with no extra calls.
+"""
+import cProfile
+import gc
+import io
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+
+
+def _length(system, args, result):
+    return len(result)
+
+
+# method -> records one call handled, from (system, args, result); None: not counted
+OPERATIONS = {
+    'load_data': _length,
+    'save_data': lambda system, args, result: len(system.students),
+    'search': _length,
+    'list_students': lambda system, args, result: len(result[0]),
+    'generate_student_id': None,
+    'import_students': lambda system, args, result: result[0],
+    'create_students': _length,
+    'update_many': _length,
+    'assign_grades': _length,
+    'delete_students': lambda system, args, result: len(args[0]),
+    'enroll_students': _length,
+    'grade_enrollments': _length,
+    'drop_enrollments': lambda system, args, result: result,
+    'report_by_course': None,
+    'report_by_grade': None,
+    'report_without_grades': None,
+    'report_statistics': None,
+    'report_cohorts': None,
+    'report_enrolled_between': None,
+    'enrolled_between': _length,
+    'enrollment_cohorts': lambda system, args, result: sum(count for _, count in result),
+    'export': lambda system, args, result: result['records'],
+    'backup': lambda system, args, result: result['records'],
+    'restore': lambda system, args, result: result[1],
+}
+
+
+class OperationStats:
+    """Totals for one instrumented method"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.records = 0
+        self.bytes_written = 0
+
+    def to_dict(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'total_ms': round(self.seconds * 1000, 3),
+            'mean_ms': round(self.seconds * 1000 / self.calls, 3) if self.calls else None,
+            'max_ms': round(self.max_seconds * 1000, 3),
+            'records': self.records,
+            'bytes_written': self.bytes_written,
+        }
+
+
+class Metrics:
+    """Per-operation call counts, timings, record counts and bytes written"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.operations = {}  # method name -> OperationStats
+
+    def instrument(self, system):
+        """Wrap system's OPERATIONS methods so every call is measured"""
+        for name, records in OPERATIONS.items():
+            setattr(system, name, self._timed(system, name, getattr(system, name), records))
+
+    def _timed(self, system, name, method, records):
+        stats = self.operations.setdefault(name, OperationStats())
+
+        @wraps(method)
+        def timed(*args, **kwargs):
+            storage = system.storage
+            written = storage.bytes_written
+            start = time.perf_counter()
+            try:
+                result = method(*args, **kwargs)
+            except BaseException:
+                stats.errors += 1
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                stats.calls += 1
+                stats.seconds += elapsed
+                stats.max_seconds = max(stats.max_seconds, elapsed)
+                stats.bytes_written += storage.bytes_written - written
+            if records is not None:
+                stats.records += records(system, args, result)
+            return result
+        return timed
+
+    def snapshot(self, system):
+        """Everything measured so far, as a JSON-able dict"""
+        students = len(system.students)  # Waits for a background load, so read the clock after it
+        return {
+            'uptime_s': round(time.perf_counter() - self.started, 3),
+            'students': students,
+            'backend': type(system.storage).__name__,
+            'bytes_written': system.storage.bytes_written,
+            'operations': {name: stats.to_dict() for name, stats in self.operations.items()
+                           if stats.calls},
+        }
+
+
+@contextmanager
+def profiled(output=None, limit=25, file=sys.stderr):
+    """Run the body under cProfile and tracemalloc, then print a summary.
+
+    With ``output`` the raw profile is also saved there, for pstats or a
+    viewer such as snakeviz.
+    """
+    tracemalloc.start()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        gc.collect()  # Instrumented systems are reference cycles; count only what is really left
+        memory = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        text = io.StringIO()
+        pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(limit)
+        print("\n" + "=" * 50, file=file)
+        print("PROFILE (top functions by cumulative time)", file=file)
+        print("=" * 50, file=file)
+        print(text.getvalue().strip(), file=file)
+        print(f"\nPython memory: {current / 1024 / 1024:.1f} MB in use, "
+              f"{peak / 1024 / 1024:.1f} MB peak", file=file)
+        print("Largest allocation sites still alive:", file=file)
+        for stat in memory.statistics('lineno')[:10]:
+            print(f"  {stat}", file=file)
+        if output:
+            profiler.dump_stats(output)
+            print(f"Profile saved to {output}", file=file)
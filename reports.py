@@ -0,0 +1,98 @@
+"""Sharded report computation over a process pool.
+
+Each worker computes partial aggregates for a contiguous slice of the
+roster and the parent merges them in slice order, so course order and
+member order match a serial pass over the roster. Roster mappings that
+offer ``shards()`` are split without being read, so decoding the records
+(the bulk of the work for a cold roster) happens in the workers too.
+"""
+import multiprocessing
+
+_shared_shards = None  # Roster slices inherited by forked workers
+
+
+def shard_statistics(students):
+    """Partial totals for report_statistics: count, age sum, graded, courses, ages"""
+    count = 0
+    age_sum = 0
+    graded = 0
+    courses = {}
+    ages = {}
+    for student in students:
+        count += 1
+        age_sum += student.age
+        if student.grade:
+            graded += 1
+        courses[student.course] = courses.get(student.course, 0) + 1
+        ages[student.age] = ages.get(student.age, 0) + 1
+    return count, age_sum, graded, courses, ages
+
+
+def merge_statistics(parts):
+    """Combine shard_statistics results in shard order"""
+    count = age_sum = graded = 0
+    courses = {}
+    ages = {}
+    for part_count, part_age_sum, part_graded, part_courses, part_ages in parts:
+        count += part_count
+        age_sum += part_age_sum
+        graded += part_graded
+        for course, number in part_courses.items():
+            courses[course] = courses.get(course, 0) + number
+        for age, number in part_ages.items():
+            ages[age] = ages.get(age, 0) + number
+    return count, age_sum, graded, courses, ages
+
+
+def shard_by_course(students):
+    """Partial report_by_course listing: course -> [(name, student_id, grade)]"""
+    courses = {}
+    for student in students:
+        courses.setdefault(student.course, []).append((student.name, student.student_id, student.grade))
+    return courses
+
+
+def merge_by_course(parts):
+    """Combine shard_by_course results in shard order"""
+    courses = {}
+    for part in parts:
+        for course, members in part.items():
+            courses.setdefault(course, []).extend(members)
+    return courses
+
+
+def _run_forked(task):
+    func, shard = task
+    return func(_shared_shards[shard])
+
+
+def _slices(students, workers):
+    students = list(students.values() if hasattr(students, 'values') else students)
+    size = -(-len(students) // workers) or 1
+    return [students[start:start + size] for start in range(0, len(students), size)]
+
+
+def map_shards(func, students, workers):
+    """Run func over workers contiguous slices of the roster (a mapping or iterable), in parallel"""
+    global _shared_shards
+    if 'fork' in multiprocessing.get_all_start_methods():
+        # Children inherit the slices, so only the small results are pickled
+        shards = students.shards(workers) if hasattr(students, 'shards') else _slices(students, workers)
+        _shared_shards = shards
+        try:
+            with multiprocessing.get_context('fork').Pool(workers) as pool:
+                return pool.map(_run_forked, [(func, shard) for shard in range(len(shards))])
+        finally:
+            _shared_shards = None
+    with multiprocessing.Pool(workers) as pool:
+        return pool.map(func, _slices(students, workers))
+
+
+def parallel_statistics(students, workers):
+    """Statistics totals computed across a process pool"""
+    return merge_statistics(map_shards(shard_statistics, students, workers))
+
+
+def parallel_by_course(students, workers):
+    """Course listing computed across a process pool"""
+    return merge_by_course(map_shards(shard_by_course, students, workers))
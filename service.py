@@ -0,0 +1,329 @@
+"""Local HTTP/JSON service over a StudentManagementSystem.
+
+Run with ``python main.py serve``. The roster stays in memory; reads are
+answered straight from it and its indexes, while writes are applied at
+once but persisted by a group commit every ``flush_interval`` seconds.
+A write is only acknowledged after the commit that contains it.
+
+Endpoints:
+    GET    /students?q=&fields=&limit=         search
+    GET    /students?sort=&order=&course=&grade=&min_age=&max_age=&page=&limit=
+                                               sorted, filtered page (grade=none: ungraded)
+    GET    /students?offset=&limit=            page in roster order
+    GET    /students?enrolled_from=&enrolled_to=&course=&limit=
+                                               enrolled in a date range (YYYY-MM-DD), oldest first
+    GET    /students/<id>
+    POST   /students                           body: name, age, email, phone, course[, grade]
+    PATCH  /students/<id>                      body: fields to change[, version]
+    DELETE /students/<id>
+    PUT    /students/<id>/grade                body: {"grade": "A" | null}
+    GET    /students/<id>/enrollments          courses with grade history
+    POST   /students/<id>/enrollments          body: course[, grade]
+    GET    /courses/<course>?grade=            students in a course (grade=none: ungraded)
+    GET    /reports/statistics | by-course | by-grade | without-grades
+    GET    /reports/cohorts?from=&to=&course=  students enrolled per month
+"""
+import asyncio
+import json
+import signal
+import sys
+from http import HTTPStatus
+from itertools import islice
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from storage import ConflictError
+
+MAX_BODY = 1 << 20
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class StudentService:
+    def __init__(self, system, flush_interval=0.02):
+        self.system = system
+        self.flush_interval = flush_interval
+        self._batch_open = False  # Batches hold the write lock, so only while writes wait
+        self._committed = None  # Future resolved by the next group commit
+
+    async def _flush_loop(self):
+        """Commit the open batch every flush_interval; pick up outside changes when idle"""
+        storage = self.system.storage
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                try:
+                    if self._batch_open:
+                        self._flush()
+                    else:
+                        storage.refresh()
+                except Exception as e:
+                    # The writers waiting on a failed commit get the error; keep serving the rest
+                    print(f"❌ Group commit failed: {e}", file=sys.stderr, flush=True)
+        finally:
+            if self._batch_open:
+                self._flush()
+
+    def _flush(self):
+        committed, self._committed = self._committed, None
+        self._batch_open = False
+        try:
+            self.system.storage.commit_batch()
+        except Exception as e:
+            if committed is not None:
+                committed.set_exception(e)
+            raise
+        if committed is not None:
+            committed.set_result(None)
+
+    def _begin_write(self):
+        """Join the batch of the next group commit, opening it if needed"""
+        if not self._batch_open:
+            self.system.storage.begin_batch()
+            self._batch_open = True
+
+    async def _durable(self):
+        """Wait for the group commit that includes the current changes"""
+        if self._committed is None:
+            self._committed = asyncio.get_running_loop().create_future()
+        await asyncio.shield(self._committed)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except (asyncio.LimitOverrunError, ValueError):
+                    # Headers past the stream limit (64 KiB); the rest of them cannot be skipped
+                    await self._respond(writer, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE,
+                                        {'error': "Request headers too large"}, keep_alive=False)
+                    break
+                request_line, *header_lines = head.decode('latin-1').split("\r\n")
+                try:
+                    method, target, version = request_line.split(" ", 2)
+                except ValueError:
+                    break
+                headers = {}
+                for line in header_lines:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+                try:
+                    length = int(headers.get('content-length', 0) or 0)
+                    if length < 0:
+                        raise ValueError(length)
+                except ValueError:
+                    # Without a length the body cannot be skipped, so the connection ends here
+                    await self._respond(writer, HTTPStatus.BAD_REQUEST,
+                                        {'error': "Invalid Content-Length"}, keep_alive=False)
+                    break
+                if length > MAX_BODY:
+                    await self._respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                                        {'error': "Request body too large"}, keep_alive=False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+                keep_alive = (headers.get('connection', '').lower() != 'close'
+                              and version.upper() == 'HTTP/1.1')
+                status, payload = await self.dispatch(method.upper(), target, body)
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload, keep_alive):
+        data = json.dumps(payload).encode('utf-8')
+        writer.write(
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data
+        )
+        await writer.drain()
+
+    async def dispatch(self, method, target, body):
+        """Route one request; returns (HTTPStatus, JSON-able payload)"""
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.split("/") if part]
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            data = json.loads(body) if body else {}
+            if not isinstance(data, dict):
+                raise HTTPError(HTTPStatus.BAD_REQUEST, "Request body must be a JSON object")
+            if parts == ['students']:
+                if method == 'GET':
+                    return HTTPStatus.OK, self.list_students(query)
+                if method == 'POST':
+                    return HTTPStatus.CREATED, await self.create_student(data)
+            elif len(parts) == 2 and parts[0] == 'students':
+                student_id = parts[1].upper()
+                if method == 'GET':
+                    return HTTPStatus.OK, self._get(student_id).to_dict()
+                if method == 'PATCH':
+                    return HTTPStatus.OK, await self.update_student(student_id, data)
+                if method == 'DELETE':
+                    return HTTPStatus.OK, await self.delete_student(student_id)
+            elif len(parts) == 3 and parts[0] == 'students' and parts[2] == 'grade' and method == 'PUT':
+                return HTTPStatus.OK, await self.assign_grade(parts[1].upper(), data)
+            elif len(parts) == 3 and parts[0] == 'students' and parts[2] == 'enrollments':
+                if method == 'GET':
+                    return HTTPStatus.OK, self.enrollments(parts[1].upper())
+                if method == 'POST':
+                    return HTTPStatus.CREATED, self.enroll(parts[1].upper(), data)
+            elif len(parts) == 2 and parts[0] == 'courses' and method == 'GET':
+                return HTTPStatus.OK, self.course_students(parts[1], query)
+            elif len(parts) == 2 and parts[0] == 'reports' and method == 'GET':
+                return HTTPStatus.OK, self.report(parts[1], query)
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"No route for {method} {url.path}")
+        except HTTPError as e:
+            return e.status, {'error': e.message}
+        except ConflictError as e:
+            return HTTPStatus.CONFLICT, {'error': str(e)}
+        except ValueError as e:
+            return HTTPStatus.BAD_REQUEST, {'error': str(e)}
+        except OSError as e:
+            # The group commit failed and was rolled back
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {'error': f"Not saved: {e}"}
+
+    def _get(self, student_id):
+        if student_id not in self.system.students:
+            raise HTTPError(HTTPStatus.NOT_FOUND, f"Student with ID {student_id} not found")
+        return self.system.students[student_id]
+
+    def list_students(self, query):
+        limit = int(query.get('limit', 100))
+        if query.get('q'):
+            fields = query['fields'].split(',') if query.get('fields') else None
+            students = self.system.search(query['q'], fields, limit)
+        elif 'enrolled_from' in query or 'enrolled_to' in query:
+            students = self.system.enrolled_between(query.get('enrolled_from'), query.get('enrolled_to'),
+                                                    query.get('course'), limit)
+        elif 'offset' in query:
+            offset = int(query['offset'])
+            students = islice(self.system.students.values(), offset, offset + limit)
+        else:
+            grade = query.get('grade')
+            students, _ = self.system.list_students(
+                query.get('sort', 'id'), query.get('order') == 'desc', query.get('course'),
+                '' if grade == 'none' else grade and grade.upper(),
+                int(query['min_age']) if 'min_age' in query else None,
+                int(query['max_age']) if 'max_age' in query else None,
+                int(query.get('page', 0)), limit)
+        return [student.to_dict() for student in students]
+
+    async def create_student(self, data):
+        self._begin_write()
+        student = self.system.create_students([data])[0]
+        await self._durable()
+        return student.to_dict()
+
+    async def update_student(self, student_id, data):
+        self._begin_write()
+        self._get(student_id)
+        student = self.system.update_many({student_id: data})[0]
+        await self._durable()
+        return student.to_dict()
+
+    async def delete_student(self, student_id):
+        self._begin_write()
+        self._get(student_id)
+        self.system.delete_students([student_id])
+        await self._durable()
+        return {'deleted': student_id}
+
+    async def assign_grade(self, student_id, data):
+        self._begin_write()
+        self._get(student_id)
+        student = self.system.assign_grades({student_id: data.get('grade')})[0]
+        await self._durable()
+        return student.to_dict()
+
+    def enrollments(self, student_id):
+        self._get(student_id)
+        table = self.system.enrollments
+        return [enrollment.to_dict(table.history(student_id, enrollment.course))
+                for enrollment in table.courses_of(student_id)]
+
+    def enroll(self, student_id, data):
+        # The enrollment log is written straight away, outside the group commit
+        self._get(student_id)
+        enrollment = self.system.enroll_students([dict(data, student_id=student_id)])[0]
+        return enrollment.to_dict(self.system.enrollments.history(student_id, enrollment.course))
+
+    def course_students(self, course, query):
+        table = self.system.enrollments
+        if 'grade' in query:
+            grade = query['grade'].upper()
+            members = table.members(course, None if grade == 'NONE' else grade)
+        else:
+            members = table.members(course)
+        students = self.system.students
+        return [dict(students[sid].to_dict(), course_grade=table.enrollment(sid, course).grade)
+                for sid in members]
+
+    def report(self, name, query):
+        aggregates = self.system.aggregates
+        students = self.system.students
+
+        def summary(student_id):
+            student = students[student_id]
+            return {'student_id': student_id, 'name': student.name,
+                    'course': student.course, 'grade': student.grade}
+
+        if name == 'statistics':
+            total = aggregates.count
+            return {
+                'total': total,
+                'average_age': aggregates.age_sum / total if total else None,
+                'with_grades': total - len(aggregates.ungraded),
+                'without_grades': len(aggregates.ungraded),
+                'courses': {course: len(members) for course, members in aggregates.by_course.items()},
+                'ages': dict(sorted(aggregates.ages.items())),
+            }
+        table = self.system.enrollments
+        if name == 'by-course':
+            return {course: [dict(summary(sid), course=course, grade=table.enrollment(sid, course).grade)
+                             for sid in table.ordered(members)]
+                    for course, members in table.by_course.items()}
+        if name == 'by-grade':
+            return {grade or 'No Grade': [dict(summary(sid), course=course, grade=grade)
+                                          for sid, course in table.ordered_pairs(members)]
+                    for grade, members in sorted(table.by_grade.items(), key=lambda item: (item[0] is None, item[0] or ''))}
+        if name == 'without-grades':
+            return [summary(sid) for sid in aggregates.ordered(aggregates.ungraded)]
+        if name == 'cohorts':
+            return dict(self.system.enrollment_cohorts(query.get('from'), query.get('to'), query.get('course')))
+        raise HTTPError(HTTPStatus.NOT_FOUND, f"Unknown report: {name}")
+
+
+async def serve(system, host='127.0.0.1', port=8080, flush_interval=0.02):
+    """Serve the roster until cancelled"""
+    service = StudentService(system, flush_interval)
+    # Build indexes before accepting requests so the first lookups are fast
+    system.search_index
+    system.aggregates
+    server = await asyncio.start_server(service.handle_connection, host, port, backlog=1024)
+    flusher = asyncio.create_task(service._flush_loop())
+    try:
+        # Stop cleanly on SIGTERM too, so pending writes get their final commit
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, server.close)
+    except NotImplementedError:
+        pass
+    print(f"Serving {len(system.students)} student(s) on http://{host}:{port}", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    except asyncio.CancelledError:
+        pass  # server.close() from the SIGTERM handler
+    finally:
+        flusher.cancel()
+        try:
+            await flusher
+        except asyncio.CancelledError:
+            pass
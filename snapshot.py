@@ -0,0 +1,276 @@
+"""Compact binary roster snapshot, read through mmap.
+
+Layout (little-endian):
+
+    header    magic, format version, record count, string count and the
+              byte offsets of the three sections below
+    records   one fixed-size RECORD per student, in roster order; text
+              fields are references into the string table
+    index     record numbers (u32) sorted by student_id, for binary search
+    strings   (string count + 1) u32 offsets, then the UTF-8 bytes; each
+              distinct string (course names, dates, ...) is stored once
+
+Opening a snapshot only reads the header, and looking a student up
+touches the index pages on its search path plus one record and its
+strings, so startup no longer depends on the roster size.
+"""
+import mmap
+import struct
+import sys
+from array import array
+from collections.abc import MutableMapping
+
+MAGIC = b'SMSB'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHxxIIQQQ')
+# student_id, name, email, phone, course, grade, enrollment_date refs; age; version
+RECORD = struct.Struct('<7IHxxI')
+OFFSET_PAIR = struct.Struct('<II')
+NO_STRING = 0xFFFFFFFF
+
+
+def _little_endian(values):
+    """array('I') bytes in file order"""
+    if sys.byteorder == 'big':
+        values = array('I', values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def write_snapshot(file, students):
+    """Write an iterable of Students to a binary file object"""
+    strings = {}
+
+    def ref(text):
+        if text is None:
+            return NO_STRING
+        number = strings.get(text)
+        if number is None:
+            number = strings[text] = len(strings)
+        return number
+
+    records = bytearray()
+    student_ids = []
+    for student in students:
+        records += RECORD.pack(ref(student.student_id), ref(student.name), ref(student.email),
+                               ref(student.phone), ref(student.course), ref(student.grade),
+                               ref(student.enrollment_date), student.age, student.version)
+        student_ids.append(student.student_id)
+    index = array('I', sorted(range(len(student_ids)), key=student_ids.__getitem__))
+
+    blobs = [text.encode('utf-8') for text in strings]
+    offsets = array('I', [0])
+    for blob in blobs:
+        offsets.append(offsets[-1] + len(blob))
+
+    records_offset = HEADER.size
+    index_offset = records_offset + len(records)
+    strings_offset = index_offset + len(index) * 4
+    file.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(student_ids), len(strings),
+                           records_offset, index_offset, strings_offset))
+    file.write(records)
+    file.write(_little_endian(index))
+    file.write(_little_endian(offsets))
+    file.write(b''.join(blobs))
+
+
+class Snapshot:
+    """Read-only view of a binary snapshot file"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            # The mapping stays valid after the file is closed or replaced
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.count, strings, self._records,
+         self._index, self._strings) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} student snapshot")
+        self._blob = self._strings + (strings + 1) * 4
+
+    def _raw_string(self, number):
+        start, end = OFFSET_PAIR.unpack_from(self._map, self._strings + number * 4)
+        return self._map[self._blob + start:self._blob + end]
+
+    def string(self, number):
+        if number == NO_STRING:
+            return None
+        return self._raw_string(number).decode('utf-8')
+
+    def record(self, record):
+        """The stored fields of one record as a dict"""
+        sid, name, email, phone, course, grade, enrolled, age, version = RECORD.unpack_from(
+            self._map, self._records + record * RECORD.size)
+        string = self.string
+        return {'student_id': string(sid), 'name': string(name), 'age': age, 'email': string(email),
+                'phone': string(phone), 'course': string(course), 'grade': string(grade),
+                'enrollment_date': string(enrolled), 'version': version}
+
+    def find(self, student_id):
+        """Record number of student_id, or None; a binary search over the index"""
+        # UTF-8 bytes sort like the strings they encode, so compare undecoded
+        key = student_id.encode('utf-8')
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            (record,) = struct.unpack_from('<I', self._map, self._index + middle * 4)
+            (number,) = struct.unpack_from('<I', self._map, self._records + record * RECORD.size)
+            found = self._raw_string(number)
+            if found == key:
+                return record
+            if found < key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+    def student_ids(self):
+        """All student IDs in roster order"""
+        string = self.string
+        table = memoryview(self._map)[self._records:self._records + self.count * RECORD.size]
+        try:
+            for fields in RECORD.iter_unpack(table):
+                yield string(fields[0])
+        finally:
+            table.release()
+
+
+def open_snapshot(path):
+    """Snapshot for path, or None if the file is missing or empty"""
+    try:
+        return Snapshot(path)
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        with open(path, 'rb') as file:
+            if file.read(1):
+                raise
+        return None  # mmap refuses empty files
+
+
+class _RecordRange:
+    """Students from snapshot records start..stop of a MappedStudentMap, in order"""
+
+    def __init__(self, students, start, stop, added):
+        self._students = students
+        self._start = start
+        self._stop = stop
+        self._added = added  # Also yield the students added since the snapshot
+
+    def __iter__(self):
+        students = self._students
+        loaded = students._loaded
+        snapshot = students._snapshot
+        for record in range(self._start, self._stop):
+            fields = snapshot.record(record)
+            student_id = fields['student_id']
+            if student_id in students._deleted:
+                continue
+            student = loaded.get(student_id)
+            yield student if student is not None else students._factory(fields)
+        if self._added:
+            for student_id in list(students._added):
+                yield loaded[student_id]
+
+
+class MappedStudentMap(MutableMapping):
+    """student_id -> Student over a Snapshot plus the changes made since.
+
+    Students are decoded from the mapped file on first lookup and kept, so
+    repeated lookups return the same object. Iterating values()/items()
+    decodes records without keeping them, so a full pass does not pull the
+    whole roster into memory.
+    """
+
+    def __init__(self, factory, snapshot=None):
+        self._factory = factory
+        self._snapshot = snapshot
+        self._loaded = {}      # student_id -> decoded or changed Student
+        self._deleted = set()  # Snapshot IDs removed since
+        self._added = {}       # IDs added since, in insertion order
+
+    def _snapshot_record(self, student_id):
+        if self._snapshot is None or student_id in self._deleted:
+            return None
+        return self._snapshot.find(student_id)
+
+    def __getitem__(self, student_id):
+        student = self._loaded.get(student_id)
+        if student is None:
+            record = self._snapshot_record(student_id)
+            if record is None:
+                raise KeyError(student_id)
+            student = self._loaded[student_id] = self._factory(self._snapshot.record(record))
+        return student
+
+    def __contains__(self, student_id):
+        return student_id in self._loaded or self._snapshot_record(student_id) is not None
+
+    def __setitem__(self, student_id, student):
+        if student_id not in self:
+            self._added[student_id] = None
+        self._loaded[student_id] = student
+
+    def __delitem__(self, student_id):
+        if student_id in self._added:
+            del self._added[student_id]
+        elif self._snapshot_record(student_id) is not None:
+            self._deleted.add(student_id)
+        else:
+            raise KeyError(student_id)
+        self._loaded.pop(student_id, None)
+
+    def __iter__(self):
+        if self._snapshot is not None:
+            for student_id in self._snapshot.student_ids():
+                if student_id not in self._deleted:
+                    yield student_id
+        yield from list(self._added)
+
+    def __len__(self):
+        count = self._snapshot.count if self._snapshot is not None else 0
+        return count - len(self._deleted) + len(self._added)
+
+    def values(self):
+        loaded = self._loaded
+        if self._snapshot is not None:
+            snapshot = self._snapshot
+            for record in range(snapshot.count):
+                fields = snapshot.record(record)
+                student_id = fields['student_id']
+                if student_id in self._deleted:
+                    continue
+                student = loaded.get(student_id)
+                yield student if student is not None else self._factory(fields)
+        for student_id in list(self._added):
+            yield loaded[student_id]
+
+    def items(self):
+        for student in self.values():
+            yield student.student_id, student
+
+    def shards(self, count):
+        """count contiguous ranges of snapshot records (changes since in the last one).
+
+        Meant for forked report workers: each decodes its own range from
+        the shared mapping, so the parent reads nothing.
+        """
+        total = self._snapshot.count if self._snapshot is not None else 0
+        size = -(-total // count) or 1
+        bounds = [(start, min(start + size, total)) for start in range(0, total, size)] or [(0, 0)]
+        return [_RecordRange(self, start, stop, added=(stop == bounds[-1][1]))
+                for start, stop in bounds]
+
+    def reset(self, other):
+        """Take over the contents of another MappedStudentMap in place"""
+        self._snapshot = other._snapshot
+        self._loaded = other._loaded
+        self._deleted = other._deleted
+        self._added = other._added
+
+    def copy(self):
+        """Shallow copy sharing the snapshot and the loaded Students"""
+        other = MappedStudentMap(self._factory, self._snapshot)
+        other._loaded = dict(self._loaded)
+        other._deleted = set(self._deleted)
+        other._added = dict(self._added)
+        return other
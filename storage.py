@@ -0,0 +1,1024 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+
+from snapshot import MappedStudentMap, open_snapshot, write_snapshot
+
+try:
+    import fcntl
+except ImportError:  # Windows has no advisory locks; single-process only
+    fcntl = None
+
+
+def append_locked(path, data):
+    """Append bytes to a log file under an exclusive lock, fsynced before returning.
+
+    Shared by the small append-only logs beside the roster, so writers in
+    several processes never interleave their lines.
+    """
+    with open(path, 'ab') as file:
+        if fcntl is not None:
+            fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        finally:
+            if fcntl is not None:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def _fsync_dir(path):
+    """Flush a directory entry so a rename survives a crash"""
+    try:
+        fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    except OSError:
+        return  # Not supported on this platform (e.g. Windows)
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _encode(record):
+    """Serialize one journal record as a compact JSON line"""
+    return json.dumps(record, separators=(',', ':')) + '\n'
+
+
+_SEPARATORS = re.compile(r'[\s,:]*')
+
+
+def iter_json_records(file, chunk_size=1 << 20):
+    """Stream (key, raw_json_text) pairs out of a top-level JSON object.
+
+    The file is read in chunks and each value is sliced out as text, so
+    only one chunk is ever parsed at a time.
+    """
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size)
+    pos = _SEPARATORS.match(buffer).end()
+    if buffer[pos:pos + 1] != '{':
+        raise json.JSONDecodeError("Expecting '{'", buffer, pos)
+    pos += 1
+    key = None
+    while True:
+        pos = _SEPARATORS.match(buffer, pos).end()
+        if key is None and buffer[pos:pos + 1] == '}':
+            return
+        try:
+            value, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                raise
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            continue
+        if key is None:
+            key = value
+        else:
+            yield key, buffer[pos:end]
+            key = None
+        pos = end
+
+
+class _ParsingSlice:
+    """Part of a LazyStudentMap's entries that parses raw records as it is iterated"""
+
+    def __init__(self, factory, entries, start, stop):
+        self._factory = factory
+        self._entries = entries
+        self._start = start
+        self._stop = stop
+
+    def __iter__(self):
+        factory = self._factory
+        for entry in self._entries[self._start:self._stop]:
+            yield factory(json.loads(entry)) if isinstance(entry, str) else entry
+
+
+class LazyStudentMap(MutableMapping):
+    """student_id -> Student mapping that parses records on first access.
+
+    Entries start out as the raw JSON text of each record and are turned
+    into Student objects (in place, keeping order) when first read.
+    """
+
+    def __init__(self, factory, entries=None):
+        self._factory = factory
+        self._entries = {} if entries is None else entries
+
+    def __getitem__(self, student_id):
+        entry = self._entries[student_id]
+        if isinstance(entry, str):
+            entry = self._factory(json.loads(entry))
+            self._entries[student_id] = entry
+        return entry
+
+    def __setitem__(self, student_id, student):
+        self._entries[student_id] = student
+
+    def __delitem__(self, student_id):
+        del self._entries[student_id]
+
+    def __contains__(self, student_id):
+        return student_id in self._entries
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def reset(self, other):
+        """Take over the contents of another LazyStudentMap in place"""
+        self._entries = other._entries
+
+    def set_raw(self, student_id, text):
+        """Store an unparsed record"""
+        self._entries[student_id] = text
+
+    def copy(self):
+        """Shallow copy that shares parsed and unparsed entries"""
+        return LazyStudentMap(self._factory, dict(self._entries))
+
+    def shards(self, count):
+        """count contiguous slices of the roster that parse their own records.
+
+        Meant for forked report workers: the parent only copies references,
+        and each worker decodes its slice itself.
+        """
+        entries = list(self._entries.values())
+        size = -(-len(entries) // count) or 1
+        return [_ParsingSlice(self._factory, entries, start, start + size)
+                for start in range(0, len(entries), size)]
+
+    def raw_items(self):
+        """Yield (student_id, json_text) without parsing untouched records"""
+        for student_id, entry in self._entries.items():
+            if not isinstance(entry, str):
+                entry = json.dumps(entry.to_dict())
+            yield student_id, entry
+
+
+class ConflictError(Exception):
+    """A record was changed by another process since it was read"""
+
+
+class StorageBackend:
+    """Interface between StudentManagementSystem and where students live.
+
+    ``load()`` returns the mapping of student_id -> Student the system works
+    on; every change must then go through ``put()``/``delete()`` so the
+    backend can persist it. ``on_put``/``on_delete``/``on_reload`` are
+    called when ``refresh()`` picks up changes made by other processes, and
+    ``on_put``/``on_delete`` again for each record a rollback puts back.
+    ``on_commit``/``on_rollback`` are called when the outermost batch has
+    been written or thrown away.
+    """
+
+    on_put = None
+    on_delete = None
+    on_reload = None
+    on_commit = None
+    on_rollback = None
+    bytes_written = 0  # Data file bytes this process has written, for metrics
+    _undo = None  # Per open batch level: student_id -> (Student or None, its to_dict() or None) before it changed
+
+    def load(self):
+        """Return the mapping of student_id -> Student"""
+        raise NotImplementedError
+
+    def put(self, student):
+        """Insert or replace one student"""
+        raise NotImplementedError
+
+    def delete(self, student_id):
+        """Remove one student"""
+        raise NotImplementedError
+
+    def save_all(self):
+        """Make every change so far durable in the primary data file"""
+        raise NotImplementedError
+
+    def refresh(self):
+        """Pick up changes other processes have written"""
+
+    def begin_batch(self):
+        """Start grouping changes into one write"""
+
+    def commit_batch(self):
+        """Write out the changes grouped since begin_batch()"""
+
+    def rollback_batch(self):
+        """Throw away the changes made since the matching begin_batch()"""
+
+    @contextmanager
+    def batch(self):
+        """Context manager that persists all changes inside it at once.
+
+        If the block raises, its changes are rolled back instead, so
+        nothing from it is written.
+        """
+        self.begin_batch()
+        try:
+            yield self
+        except BaseException:
+            self.rollback_batch()
+            raise
+        self.commit_batch()
+
+    def before_change(self, student):
+        """Call before changing a stored Student in place, so a rollback can put its fields back"""
+        self._remember(student.student_id, student)
+
+    def _remember(self, student_id, student):
+        """Note how a record stood before the innermost open batch first changes it"""
+        if self._undo and student_id not in self._undo[-1]:
+            self._undo[-1][student_id] = (student, student.to_dict() if student is not None else None)
+
+    def _committed(self):
+        if self.on_commit is not None:
+            self.on_commit()
+
+    def _rolled_back(self):
+        if self.on_rollback is not None:
+            self.on_rollback()
+
+    def _merge_undo(self):
+        """Hand a committed inner batch's undo entries to the batch around it"""
+        inner = self._undo.pop()
+        for student_id, before in inner.items():
+            self._undo[-1].setdefault(student_id, before)
+
+    def copy_from(self, students):
+        """Fill an empty store with students as they are, IDs and versions kept"""
+        raise NotImplementedError
+
+    def wait(self):
+        """Block until background work has finished"""
+
+    def close(self):
+        """Release files and connections"""
+
+
+class JournaledJSONBackend(StorageBackend):
+    """JSON snapshot plus an append-only journal of mutations.
+
+    Every put/delete appends one compact line to ``<data_file>.journal``
+    and fsyncs it, so a change costs O(record) instead of rewriting the
+    whole roster. Loading reads the last snapshot and replays the journal
+    over it; the snapshot is streamed into a LazyStudentMap so records are
+    only parsed into Students when first used. Once the journal passes
+    ``compact_threshold`` bytes it is rotated to ``<data_file>.journal.old``
+    and a background thread folds it into a new snapshot (written to a temp
+    file, fsynced, then renamed over the old one).
+
+    Several processes may share one data file. Writers take an advisory
+    lock on ``<data_file>.lock``, first replay whatever other processes
+    appended, then check the record's version: a put based on an older
+    version than the one on disk raises ConflictError instead of silently
+    overwriting it. Readers work from memory and only take the lock
+    briefly in refresh() to catch up.
+    """
+
+    def __init__(self, data_file, factory, compact_threshold=4 * 1024 * 1024):
+        self.data_file = data_file
+        self.journal_file = data_file + '.journal'
+        self.rotated_file = data_file + '.journal.old'
+        self.lock_file = data_file + '.lock'
+        self.compact_lock_file = data_file + '.compact'
+        self.factory = factory
+        self.compact_threshold = compact_threshold
+        self.students = LazyStudentMap(factory)
+        self._thread_lock = threading.RLock()
+        self._lock_fd = None
+        self._lock_depth = 0
+        self._journal = None
+        self._read_offset = 0  # Bytes of the live journal applied to memory
+        self._compactor = None
+        self._pending = None  # Buffered journal lines while batching
+        self._marks = []  # Length of _pending when each open batch level began
+        self._batch_depth = 0
+
+    def _acquire(self, exclusive=True):
+        self._thread_lock.acquire()
+        if self._lock_depth == 0 and fcntl is not None:
+            if self._lock_fd is None:
+                self._lock_fd = open(self.lock_file, 'a')
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        self._lock_depth += 1
+
+    def _release(self):
+        self._lock_depth -= 1
+        if self._lock_depth == 0 and fcntl is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+    @contextmanager
+    def _locked(self, exclusive=True):
+        """Hold the inter-process lock (re-entrant within this process)"""
+        self._acquire(exclusive)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _compaction_lock(self, blocking):
+        """Lock <data_file>.compact; returns the open file, or None if busy.
+
+        Always taken before the main lock, never while holding it unless
+        non-blocking, so two processes cannot deadlock.
+        """
+        file = open(self.compact_lock_file, 'a')
+        if fcntl is not None:
+            try:
+                fcntl.flock(file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                file.close()
+                return None
+        return file
+
+    def load(self):
+        """Load the snapshot and replay any journal records over it"""
+        with self._locked():
+            self._reload(truncate=True)
+            if os.path.exists(self.rotated_file):
+                compact_lock = self._compaction_lock(blocking=False)
+                if compact_lock is not None:
+                    # A compaction died half way; fold everything now
+                    self._fold()
+                    compact_lock.close()
+        return self.students
+
+    def refresh(self):
+        """Pick up changes other processes have written since the last look"""
+        with self._locked(exclusive=False):
+            self._catch_up(truncate=False)
+
+    def _reload(self, truncate):
+        """Rebuild memory from the snapshot and journals on disk"""
+        students = self._read_snapshot()
+        if os.path.exists(self.rotated_file):
+            with open(self.rotated_file, 'rb') as file:
+                self._replay(file, students)
+        valid = 0
+        if os.path.exists(self.journal_file):
+            with open(self.journal_file, 'rb') as file:
+                valid = self._replay(file, students)
+        self.students.reset(students)
+        self._open_journal(valid if truncate else None)
+        self._read_offset = valid
+        if self.on_reload is not None:
+            self.on_reload()
+
+    def _catch_up(self, truncate):
+        """Apply journal records appended by other processes (lock held)"""
+        try:
+            stat = os.stat(self.journal_file)
+        except FileNotFoundError:
+            stat = None
+        if (stat is None or self._journal is None
+                or stat.st_ino != os.fstat(self._journal.fileno()).st_ino
+                or stat.st_size < self._read_offset):
+            # Another process compacted or reset the journal
+            self._reload(truncate)
+            return
+        if stat.st_size > self._read_offset:
+            with open(self.journal_file, 'rb') as file:
+                file.seek(self._read_offset)
+                self._read_offset += self._replay(file, self.students, notify=True)
+            if truncate and self._read_offset < stat.st_size:
+                self._journal.truncate(self._read_offset)  # Torn tail from a crash
+
+    def _read_snapshot(self):
+        students = LazyStudentMap(self.factory)
+        if not os.path.exists(self.data_file):
+            return students
+        try:
+            with open(self.data_file, 'r') as file:
+                for sid, text in iter_json_records(file):
+                    students.set_raw(sid, text)
+        except (json.JSONDecodeError, FileNotFoundError):
+            return LazyStudentMap(self.factory)
+        return students
+
+    def _replay(self, file, students, notify=False):
+        """Apply journal records to students, returning the valid byte length"""
+        valid = 0
+        for line in file:
+            if not line.endswith(b'\n'):
+                break  # Torn write from a crash
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if record['op'] == 'put':
+                student = self.factory(record['rec'])
+                students[student.student_id] = student
+                if notify and self.on_put is not None:
+                    self.on_put(student)
+            elif record['op'] == 'del':
+                if students.pop(record['id'], None) is not None and notify and self.on_delete is not None:
+                    self.on_delete(record['id'])
+            valid += len(line)
+        return valid
+
+    def _open_journal(self, valid_size=None):
+        if self._journal is not None:
+            self._journal.close()
+        self._journal = open(self.journal_file, 'ab')
+        if valid_size is not None and self._journal.tell() > valid_size:
+            # Drop a partially written tail so new records stay parseable
+            self._journal.truncate(valid_size)
+
+    def put(self, student):
+        """Insert or replace a student and journal the new record.
+
+        Raises ConflictError if another process changed or deleted the
+        student since this copy was read.
+        """
+        with self._locked():
+            if self._batch_depth == 0:
+                self._catch_up(truncate=True)
+            current = self.students.get(student.student_id)
+            if current is None and student.version:
+                raise ConflictError(f"Student {student.student_id} was deleted by another user")
+            if current is not None and current is not student and current.version != student.version:
+                raise ConflictError(f"Student {student.student_id} was changed by another user")
+            self._remember(student.student_id, current)
+            student.version += 1
+            self.students[student.student_id] = student
+            self._append(_encode({'op': 'put', 'rec': student.to_dict()}))
+
+    def delete(self, student_id):
+        """Remove a student and journal the deletion"""
+        with self._locked():
+            if self._batch_depth == 0:
+                self._catch_up(truncate=True)
+            if student_id not in self.students:
+                raise ConflictError(f"Student {student_id} was deleted by another user")
+            self._remember(student_id, self.students[student_id])
+            del self.students[student_id]
+            self._append(_encode({'op': 'del', 'id': student_id}))
+
+    def begin_batch(self):
+        """Lock the roster and buffer journal records until commit_batch()"""
+        self._acquire()
+        if self._batch_depth == 0:
+            self._catch_up(truncate=True)
+            self._pending = []
+            self._undo = []
+        self._marks.append(len(self._pending))
+        self._undo.append({})
+        self._batch_depth += 1
+
+    def commit_batch(self):
+        """Append every buffered record with a single write and fsync"""
+        try:
+            self._batch_depth -= 1
+            self._marks.pop()
+            if self._batch_depth > 0:
+                self._merge_undo()
+                return
+            pending, self._pending = self._pending, None
+            undo, self._undo = self._undo.pop(), None
+            if pending:
+                try:
+                    self._append(''.join(pending))
+                except BaseException:
+                    self._restore(undo)  # Not on disk, so not in memory either
+                    self._rolled_back()
+                    raise
+            self._committed()
+        finally:
+            self._release()
+
+    def rollback_batch(self):
+        """Drop the records buffered since the matching begin_batch() and undo them in memory"""
+        try:
+            self._batch_depth -= 1
+            del self._pending[self._marks.pop():]
+            self._restore(self._undo.pop())
+            if self._batch_depth == 0:
+                self._pending = self._undo = None
+                self._rolled_back()
+        finally:
+            self._release()
+
+    def _restore(self, undo):
+        """Put the students a batch touched back as they were on disk"""
+        for student_id, (student, record) in undo.items():
+            if record is None:
+                self.students.pop(student_id, None)
+                if self.on_delete is not None:
+                    self.on_delete(student_id)
+            else:
+                for field, value in record.items():
+                    setattr(student, field, value)
+                self.students[student_id] = student
+                if self.on_put is not None:
+                    self.on_put(student)
+
+    def _append(self, data):
+        """Write journal data (lock held) and compact if it grew too big"""
+        if self._pending is not None:
+            self._pending.append(data)
+            return
+        data = data.encode('utf-8')
+        self._journal.write(data)
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+        self._read_offset += len(data)
+        self.bytes_written += len(data)
+        if self._read_offset >= self.compact_threshold:
+            self._start_compaction()
+
+    def _start_compaction(self):
+        """Rotate the journal and snapshot in the background (lock held)"""
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        compact_lock = self._compaction_lock(blocking=False)
+        if compact_lock is None:
+            return  # Another process is already compacting
+        if os.path.exists(self.rotated_file):
+            # Left over from a crashed compaction; its records are in memory
+            self._fold()
+            compact_lock.close()
+            return
+        self._journal.close()
+        os.replace(self.journal_file, self.rotated_file)
+        _fsync_dir(self.journal_file)
+        self._journal = None
+        self._open_journal()
+        self._read_offset = 0
+        # Records are full images, so anything changed after this copy is
+        # also in the new journal and replaying it again is harmless.
+        snapshot = self.students.copy()
+        self._compactor = threading.Thread(target=self._compact, args=(snapshot, compact_lock), daemon=True)
+        self._compactor.start()
+
+    def _compact(self, snapshot, compact_lock):
+        try:
+            tmp_file = self._write_temp(snapshot)
+            with self._locked():
+                os.replace(tmp_file, self.data_file)
+                _fsync_dir(self.data_file)
+                os.remove(self.rotated_file)
+        finally:
+            compact_lock.close()
+
+    def _fold(self):
+        """Snapshot memory and start an empty journal (lock held)"""
+        tmp_file = self._write_temp(self.students)
+        os.replace(tmp_file, self.data_file)
+        # A new file rather than a truncate, so other processes notice
+        empty_file = self.journal_file + '.new'
+        open(empty_file, 'wb').close()
+        os.replace(empty_file, self.journal_file)
+        _fsync_dir(self.data_file)
+        self._journal.close()
+        self._journal = None
+        self._open_journal()
+        self._read_offset = 0
+        if os.path.exists(self.rotated_file):
+            os.remove(self.rotated_file)
+
+    def _write_temp(self, students):
+        """Write students to a fsynced temp file and return its path"""
+        tmp_file = f"{self.data_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w') as file:
+            file.write('{')
+            separator = '\n'
+            for sid, text in students.raw_items():
+                file.write(f"{separator}{json.dumps(sid)}: {text}")
+                separator = ',\n'
+            file.write('\n}\n')
+            file.flush()
+            os.fsync(file.fileno())
+            self.bytes_written += os.fstat(file.fileno()).st_size
+        return tmp_file
+
+    def wait(self):
+        """Block until a running background compaction has finished"""
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+
+    def save_all(self):
+        """Write a full snapshot now and reset the journal"""
+        self.wait()
+        compact_lock = self._compaction_lock(blocking=True)
+        try:
+            with self._locked():
+                self._catch_up(truncate=True)
+                self._fold()
+        finally:
+            compact_lock.close()
+
+    def copy_from(self, students):
+        """Store students unchanged and write them out as one snapshot"""
+        compact_lock = self._compaction_lock(blocking=True)
+        try:
+            with self._locked():
+                for student in students:
+                    self.students[student.student_id] = student
+                self._fold()
+        finally:
+            compact_lock.close()
+
+    def close(self):
+        """Finish background work and close the journal"""
+        self.wait()
+        with self._thread_lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            if self._lock_fd is not None:
+                self._lock_fd.close()
+                self._lock_fd = None
+
+
+class BinarySnapshotBackend(JournaledJSONBackend):
+    """Journaled storage whose snapshot is the binary format of snapshot.py.
+
+    Journaling, locking and compaction work as for JSON; only the snapshot
+    differs. It is memory-mapped rather than parsed, so loading costs the
+    journal replay alone and students are decoded one by one on lookup.
+    """
+
+    def __init__(self, data_file, factory, compact_threshold=4 * 1024 * 1024):
+        super().__init__(data_file, factory, compact_threshold)
+        self.students = MappedStudentMap(factory)
+
+    def _read_snapshot(self):
+        return MappedStudentMap(self.factory, open_snapshot(self.data_file))
+
+    def _write_temp(self, students):
+        """Write students to a fsynced temp file and return its path"""
+        tmp_file = f"{self.data_file}.{os.getpid()}.tmp"
+        with open(tmp_file, 'wb') as file:
+            write_snapshot(file, students.values())
+            file.flush()
+            os.fsync(file.fileno())
+            self.bytes_written += os.fstat(file.fileno()).st_size
+        return tmp_file
+
+
+COLUMNS = ('student_id', 'name', 'age', 'email', 'phone', 'course', 'grade', 'enrollment_date', 'version')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    student_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    age INTEGER NOT NULL,
+    email TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    course TEXT NOT NULL,
+    grade TEXT,
+    enrollment_date TEXT,
+    version INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_students_name ON students(name);
+CREATE INDEX IF NOT EXISTS idx_students_course ON students(course);
+CREATE INDEX IF NOT EXISTS idx_students_grade ON students(grade);
+"""
+
+
+class SQLiteStudentMap(MutableMapping):
+    """Mapping view over the students table.
+
+    Nothing is cached: each lookup is a primary-key query and iteration
+    streams rows, so memory does not grow with the roster.
+    """
+
+    def __init__(self, conn, factory, path=None):
+        self._conn = conn
+        self._factory = factory
+        self._path = path
+        self._select = f"SELECT {', '.join(COLUMNS)} FROM students"
+
+    def _build(self, row):
+        return self._factory(dict(zip(COLUMNS, row)))
+
+    def __getitem__(self, student_id):
+        row = self._conn.execute(self._select + " WHERE student_id = ?", (student_id,)).fetchone()
+        if row is None:
+            raise KeyError(student_id)
+        return self._build(row)
+
+    def __contains__(self, student_id):
+        row = self._conn.execute("SELECT 1 FROM students WHERE student_id = ?", (student_id,)).fetchone()
+        return row is not None
+
+    def __setitem__(self, student_id, student):
+        data = student.to_dict()
+        self._conn.execute(
+            f"INSERT INTO students ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))}) "
+            "ON CONFLICT(student_id) DO UPDATE SET "
+            + ', '.join(f"{column} = excluded.{column}" for column in COLUMNS[1:]),
+            tuple(data[column] for column in COLUMNS)
+        )
+
+    def __delitem__(self, student_id):
+        cursor = self._conn.execute("DELETE FROM students WHERE student_id = ?", (student_id,))
+        if cursor.rowcount == 0:
+            raise KeyError(student_id)
+
+    def __iter__(self):
+        for (student_id,) in self._conn.execute("SELECT student_id FROM students ORDER BY rowid"):
+            yield student_id
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM students").fetchone()[0]
+
+    def values(self):
+        for row in self._conn.execute(self._select + " ORDER BY rowid"):
+            yield self._build(row)
+
+    def items(self):
+        for student in self.values():
+            yield student.student_id, student
+
+    def shards(self, count):
+        """count rowid ranges of the table, each read over its own connection when iterated.
+
+        Meant for forked report workers, which must not share the parent's
+        connection; only committed rows are seen.
+        """
+        total = len(self)
+        size = -(-total // count) or 1
+        firsts = [self._conn.execute("SELECT rowid FROM students ORDER BY rowid LIMIT 1 OFFSET ?",
+                                     (offset,)).fetchone()[0] for offset in range(0, total, size)]
+        return [_RowidRange(self._path, self._factory, self._select, first, last)
+                for first, last in zip(firsts, firsts[1:] + [None])]
+
+
+class _RowidRange:
+    """Students with first <= rowid < last (no upper bound if last is None)"""
+
+    def __init__(self, path, factory, select, first, last):
+        self._path = path
+        self._factory = factory
+        self._select = select
+        self._first = first
+        self._last = last
+
+    def __iter__(self):
+        conn = sqlite3.connect(self._path)
+        try:
+            if self._last is None:
+                rows = conn.execute(self._select + " WHERE rowid >= ? ORDER BY rowid", (self._first,))
+            else:
+                rows = conn.execute(self._select + " WHERE rowid >= ? AND rowid < ? ORDER BY rowid",
+                                    (self._first, self._last))
+            for row in rows:
+                yield self._factory(dict(zip(COLUMNS, row)))
+        finally:
+            conn.close()
+
+
+class SQLiteBackend(StorageBackend):
+    """SQLite database with indexes on student_id, name, course and grade.
+
+    Students are read on demand through SQLiteStudentMap and each change is
+    a single-row INSERT/UPDATE/DELETE, so startup does not load the roster.
+    Updates are conditional on the version column (optimistic concurrency),
+    so several processes can share one database without lost updates.
+    """
+
+    def __init__(self, data_file, factory):
+        self.data_file = data_file
+        self.factory = factory
+        self.conn = None
+        self.students = None
+        self._batch_depth = 0
+        self._data_version = None
+
+    def load(self):
+        """Open the database, creating or upgrading the schema"""
+        self.conn = sqlite3.connect(self.data_file, timeout=30, isolation_level=None,
+                                    check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(students)")}
+        if 'version' not in columns:
+            self.conn.execute("ALTER TABLE students ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+        self._data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        self.students = SQLiteStudentMap(self.conn, self.factory, self.data_file)
+        return self.students
+
+    def refresh(self):
+        """Tell listeners to rebuild if another connection has committed"""
+        data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self._data_version:
+            self._data_version = data_version
+            if self.on_reload is not None:
+                self.on_reload()
+
+    def put(self, student):
+        """Insert a new row or update one whose version still matches"""
+        self._remember(student.student_id, student if student.version else None)  # New rows just go
+        data = student.to_dict()
+        data['version'] = student.version + 1
+        if student.version == 0:
+            try:
+                self.conn.execute(
+                    f"INSERT INTO students ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                    tuple(data[column] for column in COLUMNS)
+                )
+                student.version += 1
+                return
+            except sqlite3.IntegrityError:
+                pass  # Rows from before versioning, or copied as-is, are still at version 0
+        cursor = self.conn.execute(
+            "UPDATE students SET " + ', '.join(f"{column} = ?" for column in COLUMNS[1:])
+            + " WHERE student_id = ? AND version = ?",
+            tuple(data[column] for column in COLUMNS[1:]) + (student.student_id, student.version)
+        )
+        if cursor.rowcount == 0:
+            if student.version == 0:
+                raise ConflictError(f"Student {student.student_id} already exists")
+            if student.student_id in self.students:
+                raise ConflictError(f"Student {student.student_id} was changed by another user")
+            raise ConflictError(f"Student {student.student_id} was deleted by another user")
+        student.version += 1
+
+    def delete(self, student_id):
+        """Delete one row"""
+        self._remember(student_id, None)
+        try:
+            del self.students[student_id]
+        except KeyError:
+            raise ConflictError(f"Student {student_id} was deleted by another user") from None
+
+    def begin_batch(self):
+        """Open a write transaction so a batch commits once (a savepoint when nested)"""
+        if self._batch_depth == 0:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self._undo = []
+        else:
+            self.conn.execute(f"SAVEPOINT batch{self._batch_depth}")
+        self._undo.append({})
+        self._batch_depth += 1
+
+    def commit_batch(self):
+        """Commit the batch transaction"""
+        self._batch_depth -= 1
+        if self._batch_depth > 0:
+            self.conn.execute(f"RELEASE batch{self._batch_depth}")
+            self._merge_undo()
+            return
+        undo, self._undo = self._undo.pop(), None
+        try:
+            self.conn.execute("COMMIT")
+        except BaseException:
+            if self.conn.in_transaction:
+                self.conn.execute("ROLLBACK")
+            self._restore(undo)
+            self._rolled_back()
+            raise
+        self._committed()
+
+    def rollback_batch(self):
+        """Roll back to where the matching begin_batch() started"""
+        self._batch_depth -= 1
+        undo = self._undo.pop()
+        if self._batch_depth > 0:
+            self.conn.execute(f"ROLLBACK TO batch{self._batch_depth}")
+            self.conn.execute(f"RELEASE batch{self._batch_depth}")
+        else:
+            self._undo = None
+            if self.conn.in_transaction:  # SQLite rolls back by itself after some errors
+                self.conn.execute("ROLLBACK")
+        self._restore(undo)
+        if self._batch_depth == 0:
+            self._rolled_back()
+
+    def _restore(self, undo):
+        """Put rolled-back Students' fields back and re-announce the rows"""
+        for student_id, (student, record) in undo.items():
+            if record is not None:
+                for field, value in record.items():
+                    setattr(student, field, value)
+            if student_id in self.students:
+                if self.on_put is not None:
+                    self.on_put(self.students[student_id])
+            elif self.on_delete is not None:
+                self.on_delete(student_id)
+
+    def copy_from(self, students):
+        """Insert students unchanged in one transaction"""
+        with self.batch():
+            for student in students:
+                self.students[student.student_id] = student
+
+    def save_all(self):
+        """Checkpoint the write-ahead log into the main database file"""
+        try:
+            # The log's pages are what the checkpoint copies into the database
+            self.bytes_written += os.path.getsize(self.data_file + '-wal')
+        except OSError:
+            pass
+        self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def close(self):
+        """Close the database connection"""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class IdAllocator:
+    """Allocates student IDs from a high-water mark kept in ``<data_file>.seq``.
+
+    Reserving IDs is a locked read-modify-write of that small file, so it
+    costs the same however big the roster is, and several importers can
+    each reserve a block of IDs without handing out the same one twice.
+    IDs are never reused once handed out.
+    """
+
+    def __init__(self, data_file, prefix='STU'):
+        self.path = data_file + '.seq'
+        self.prefix = prefix
+
+    def format_id(self, number):
+        """STU001 ... STU999, then STU1000 and up"""
+        return f"{self.prefix}{number:03d}"
+
+    def parse_id(self, student_id):
+        """Numeric part of an ID, or None if it is not one of ours"""
+        digits = student_id[len(self.prefix):]
+        if student_id.startswith(self.prefix) and digits.isdigit():
+            return int(digits)
+        return None
+
+    def _scan(self, student_ids):
+        numbers = (self.parse_id(sid) for sid in student_ids)
+        return max((number for number in numbers if number is not None), default=0)
+
+    def high_water(self):
+        """Highest ID number handed out so far, or None if unknown"""
+        try:
+            with open(self.path) as file:
+                text = file.read().strip()
+        except FileNotFoundError:
+            return None
+        return int(text) if text.isdigit() else None
+
+    def reserve(self, count, student_ids=()):
+        """Reserve count consecutive IDs and return them as a list.
+
+        student_ids is only scanned when the counter file is missing or
+        unreadable, to rebuild the high-water mark.
+        """
+        with open(self.path, 'a+') as file:
+            if fcntl is not None:
+                fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                file.seek(0)
+                text = file.read().strip()
+                last = int(text) if text.isdigit() else self._scan(student_ids)
+                file.seek(0)
+                file.truncate()
+                file.write(f"{last + count}\n")
+                file.flush()
+                os.fsync(file.fileno())
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(file, fcntl.LOCK_UN)
+        return [self.format_id(number) for number in range(last + 1, last + count + 1)]
+
+
+BACKENDS = {
+    'json': JournaledJSONBackend,
+    'binary': BinarySnapshotBackend,
+    'sqlite': SQLiteBackend,
+}
+
+
+def open_backend(data_file, factory, backend=None):
+    """Create the storage backend for data_file.
+
+    ``backend`` names one of BACKENDS; when omitted it is picked from the
+    file extension (.db/.sqlite/.sqlite3 -> sqlite, .bin -> binary, anything
+    else -> json).
+    """
+    if backend is None:
+        extension = os.path.splitext(data_file)[1].lower()
+        if extension in ('.db', '.sqlite', '.sqlite3'):
+            backend = 'sqlite'
+        elif extension == '.bin':
+            backend = 'binary'
+        else:
+            backend = 'json'
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown storage backend: {backend}")
+    return BACKENDS[backend](data_file, factory)
@@ -0,0 +1,148 @@
+"""Column-wise validation of student records.
+
+Records are split into one list per field and each list is checked in a
+single pass with precompiled patterns, so a batch reports every failing
+row at once and the per-row cost is a few C-level calls.
+"""
+import re
+from itertools import compress, count, repeat
+from operator import methodcaller, ne, not_
+
+FIELDS = ('name', 'age', 'email', 'phone', 'course', 'grade')
+GRADES = ('A', 'B', 'C', 'D', 'F')
+
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+PHONE_PATTERN = re.compile(r'^\+?[0-9]{10,15}$')
+_VALID_GRADES = frozenset(GRADES + ('',))
+_VALID_AGES = frozenset(str(age) for age in range(5, 101))
+
+
+def _valid_age(value):
+    # A set lookup instead of isdigit() + int(); leading zeros still count
+    return value in _VALID_AGES or (value.isdigit() and 5 <= int(value) <= 100)
+
+
+# field -> check returning something truthy for a valid cleaned value
+CHECKS = {
+    'name': bool,
+    'age': _valid_age,
+    'email': EMAIL_PATTERN.match,
+    'phone': PHONE_PATTERN.match,
+    'course': bool,
+    'grade': _VALID_GRADES.__contains__,
+}
+
+
+def message(field, value):
+    """Why a value failed its field's check"""
+    if field == 'name':
+        return "Name cannot be empty"
+    if field == 'age':
+        return "Age must be a number between 5 and 100"
+    if field == 'email':
+        return f"Invalid email format: {value!r}"
+    if field == 'phone':
+        return f"Invalid phone number: {value!r}"
+    if field == 'course':
+        return "Course cannot be empty"
+    return f"Invalid grade: {value!r}"
+
+
+def field_problem(field, value):
+    """Describe what is wrong with one cleaned value, or None if it is valid"""
+    return None if CHECKS[field](value) else message(field, value)
+
+
+class UnreadableRecord:
+    """Stands in for an input row that could not be parsed, so it is rejected like an invalid one"""
+
+    def __init__(self, problem):
+        self.problem = problem
+
+
+def record_problem(record):
+    """Why record is not a field -> value mapping at all, or None if it is one"""
+    if isinstance(record, dict):
+        return None
+    if isinstance(record, UnreadableRecord):
+        return record.problem
+    return f"Expected a JSON object, got {type(record).__name__}"
+
+
+def _clean(value):
+    return value.strip() if value.__class__ is str else str(value or '').strip()
+
+
+def clean_columns(records):
+    """Split records into {field: [stripped string per record]}"""
+    columns = {}
+    for field in FIELDS:
+        values = list(map(methodcaller('get', field), records))
+        try:
+            columns[field] = list(map(str.strip, values))  # Usual case: every value is a str
+        except TypeError:
+            columns[field] = list(map(_clean, values))
+    columns['grade'] = list(map(str.upper, columns['grade']))
+    return columns
+
+
+def _failing(check, column):
+    """Positions in column whose value fails check, without a Python-level loop"""
+    return compress(count(), map(not_, map(check, column)))
+
+
+def check_columns(columns, problems):
+    """Add (field, message) to problems[row] for every invalid value"""
+    for field in FIELDS:
+        column = columns[field]
+        for row in _failing(CHECKS[field], column):
+            problems.setdefault(row, []).append((field, message(field, column[row])))
+
+
+def check_duplicates(columns, contacts, problems, owners=None):
+    """Flag emails and phones already used in the roster or earlier in the batch.
+
+    ``owners`` lists the student ID each row belongs to (None for new
+    records), so a student keeping their own email is not a duplicate.
+    """
+    for field in contacts.FIELDS:
+        label = field.capitalize()
+        keys = list(map(contacts.key_function(field), columns[field]))
+        taken_rows = set(compress(count(), map(contacts.owners_of(field).__contains__, keys)))
+        for row in sorted(taken_rows):
+            taken = contacts.owners(field, keys[row], normalized=True)
+            owner = owners[row] if owners is not None else None
+            if taken != {owner}:
+                problems.setdefault(row, []).append(
+                    (field, f"{label} {columns[field][row]!r} is already used by {', '.join(sorted(taken - {owner}))}"))
+        first = dict(zip(reversed(keys), range(len(keys) - 1, -1, -1)))  # key -> first row
+        if len(first) == len(keys):
+            continue  # No repeats inside the batch
+        for row in compress(count(), map(ne, map(first.__getitem__, keys), count())):
+            if keys[row] and row not in taken_rows:
+                problems.setdefault(row, []).append((field, f"{label} {columns[field][row]!r} is repeated in this batch"))
+
+
+def validate_records(records, contacts=None, owners=None, changed=None):
+    """Clean and check a list of records in one pass per field.
+
+    Returns (rows, problems): rows holds a dict of cleaned values per
+    record and problems maps a record's position to its messages. With
+    ``changed`` (a set of field names per record) only problems in those
+    fields are reported.
+    """
+    unreadable = {row: problem for row, problem in enumerate(map(record_problem, records)) if problem}
+    if unreadable:
+        records = [{} if row in unreadable else record for row, record in enumerate(records)]
+    columns = clean_columns(records)
+    problems = {}
+    check_columns(columns, problems)
+    if contacts is not None:
+        check_duplicates(columns, contacts, problems, owners)
+    if changed is not None:
+        problems = {row: [item for item in found if item[0] in changed[row]]
+                    for row, found in problems.items()}
+    problems = {row: [text for _, text in found] for row, found in problems.items() if found}
+    problems.update((row, [problem]) for row, problem in unreadable.items())
+    rows = list(map(dict, map(zip, repeat(FIELDS), zip(*(columns[field] for field in FIELDS)))))
+    return rows, problems